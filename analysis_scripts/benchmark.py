@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import synthetic
+
+
+# times the analysis scripts on synthetic trees (synthetic.py) at several multiples of the collected data's size: each
+# script runs in its own process against a fresh cache (cold) and again against the cache it left (warm); the time
+# spent inside the shared loaders below is reported as the load phase, the rest of the run as the compute phase,
+# together with the peak resident memory after loading and overall; results go to a JSON report for regression tracking
+
+path = "./benchmark/"  # work tree: generated data, run directories and caches per scale
+report_file = "./results/benchmark.json"
+
+SCRIPTS = ['numvideos_descriptives.py', 'topic_poolavgs.py', 'dropout_rate.py', 'consistency_analyses_videos.py',
+           'consistency_analyses_details.py', 'consistency_analyses_timedescs.py', 'consistency_analyses_timeplots.py',
+           'consistency_analyses_threads.py', 'video_frequency_predictors.py', 'shap_features.py']
+
+# (module, function) that read snapshots into memory; nested calls (load_ids -> read_fields) count once
+LOADERS = [('snapshots', 'read_fields'), ('snapshots', 'load_fields'), ('snapshots', 'load_ids'), ('offsets', 'latest_fields'),
+           ('scanner', 'scan'), ('coverage', 'coverage_table'), ('features', 'feature_table')]
+
+# (module, setting, subdirectory) of every on-disk cache, pointed into the run's cache directory
+CACHES = [('snapshots', 'cache_dir', 'snapshots/'), ('coverage', 'cache_dir', 'coverage/'), ('features', 'cache_dir', 'features/'),
+          ('offsets', 'index_dir', 'offsets/')]
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is in KB on Linux, in bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1 << 20) if sys.platform == 'darwin' else rss / 1024
+
+
+def run_script(script: str, data: str, cache: str, result_file: str):
+    # runs one analysis script in this process with its path set to data and its caches under cache, and writes
+    # the timings of the run to result_file
+    sys.path.insert(0, here)
+    timing = {'load_s': 0.0, 'load_calls': 0, 'load_peak_rss_mb': 0.0}
+    depth = [0]
+
+    def timed(func):
+        def wrapper(*args, **kwargs):
+            if depth[0]:
+                return func(*args, **kwargs)
+            depth[0] += 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                depth[0] -= 1
+                timing['load_s'] += time.perf_counter() - start
+                timing['load_calls'] += 1
+                timing['load_peak_rss_mb'] = max(timing['load_peak_rss_mb'], peak_rss_mb())
+        return wrapper
+
+    modules = {}
+    for name in {entry[0] for entry in LOADERS + CACHES}:
+        try:
+            modules[name] = __import__(name)
+        except ImportError:  # a loader whose dependencies are missing; scripts using it fail on their own import
+            continue
+    for name, func in LOADERS:
+        if name in modules:
+            setattr(modules[name], func, timed(getattr(modules[name], func)))
+    for name, setting, subdir in CACHES:
+        if name in modules:
+            setattr(modules[name], setting, os.path.join(cache, subdir))
+
+    with open(script, 'r') as f:
+        source = re.sub(r'^path = .*$', f"path = {data!r}", f.read(), count=1, flags=re.M)
+
+    timing['status'], timing['error'] = 'ok', None
+    start = time.perf_counter()
+    try:
+        exec(compile(source, script, 'exec'), {'__name__': '__main__', '__file__': script})
+    except BaseException as e:
+        timing['status'], timing['error'] = 'error', f"{type(e).__name__}: {e}"
+    timing['wall_s'] = time.perf_counter() - start
+    timing['compute_s'] = timing['wall_s'] - timing['load_s']
+    timing['peak_rss_mb'] = peak_rss_mb()
+    timing['children_peak_rss_mb'] = peak_rss_mb(resource.RUSAGE_CHILDREN)  # process pools, e.g. scanner, markov
+
+    with open(result_file, 'w') as fw:
+        json.dump(timing, fw)
+
+
+def prepare_data(workdir: str, scale: float, settings):
+    # synthetic tree at scale times the videos per snapshot, regenerated only when its settings changed
+    data = os.path.join(workdir, f"scale_{scale:g}", 'data')
+    settings = dict(settings, videos=int(settings['videos'] * scale))
+    stamp = os.path.join(data, 'generator.json')
+    if os.path.exists(stamp):
+        with open(stamp, 'r') as f:
+            if json.load(f) == settings:
+                return data, settings
+
+    print(f"Generating {scale:g}x data in {data}")
+    shutil.rmtree(data, ignore_errors=True)
+    synthetic.generate(data, **settings)
+    with open(stamp, 'w') as fw:
+        json.dump(settings, fw)
+    return data, settings
+
+
+def data_bytes(data: str):
+    return sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(data) for file in files if file.endswith('.ndjson'))
+
+
+def run(script: str, data: str, rundir: str, cache: str, state: str, timeout: float=None):
+    # timings of one script run in a subprocess (see run_script), or its failure
+    result_file = os.path.join(rundir, 'run.json')
+    log_file = os.path.join(rundir, f"{script.removesuffix('.py')}.{state}.log")
+    if os.path.exists(result_file):
+        os.remove(result_file)
+
+    cmd = [sys.executable, os.path.abspath(__file__), '--run', os.path.join(here, script), '--data', data, '--cache', cache, '--result', result_file]
+    start = time.perf_counter()
+    with open(log_file, 'w') as log:
+        try:
+            proc = subprocess.run(cmd, cwd=rundir, env=dict(os.environ, MPLBACKEND='Agg'), stdout=log, stderr=subprocess.STDOUT, timeout=timeout)
+            returncode = proc.returncode
+        except subprocess.TimeoutExpired:
+            returncode = None
+
+    if os.path.exists(result_file):
+        with open(result_file, 'r') as f:
+            return json.load(f)
+    error = 'timed out' if returncode is None else f"exited with {returncode}"
+    with open(log_file, 'r') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    if lines:
+        error += f": {lines[-1]}"
+    return {'status': 'crashed', 'error': error, 'wall_s': time.perf_counter() - start}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=here, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(scales, scripts=SCRIPTS, workdir: str=path, report: str=report_file, settings=None, timeout: float=None):
+    settings = settings or {}
+    settings = {'topics': settings.get('topics'), 'snapshots': settings.get('snapshots', 16), 'videos': settings.get('videos', 750),
+                'churn': settings.get('churn', 0.1), 'comments': settings.get('comments', 5.0), 'seed': settings.get('seed', 0)}
+    results = {'created': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'commit': git_commit(),
+               'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+               'generator': settings, 'scales': {}, 'runs': []}
+
+    os.makedirs(os.path.dirname(report) or '.', exist_ok=True)
+    for scale in scales:
+        data, scale_settings = prepare_data(workdir, scale, settings)
+        results['scales'][f"{scale:g}"] = {'videos': scale_settings['videos'], 'data_bytes': data_bytes(data)}
+
+        rundir = os.path.join(workdir, f"scale_{scale:g}", 'run')
+        cache = os.path.join(workdir, f"scale_{scale:g}", 'cache')
+        for subdir in ('results', 'figures'):
+            os.makedirs(os.path.join(rundir, subdir), exist_ok=True)
+        shutil.copy(os.path.join(data, 'queries.json'), os.path.join(rundir, 'queries.json'))
+
+        for script in scripts:
+            shutil.rmtree(cache, ignore_errors=True)
+            for state in ('cold', 'warm'):
+                timing = run(script, data, rundir, cache, state, timeout)
+                results['runs'].append({'scale': scale, 'script': script, 'cache': state, **timing})
+                line = f"{scale:g}x {script} ({state}): {timing['status']}, {timing['wall_s']:.1f}s"
+                if timing['status'] == 'ok':
+                    line += f" (load {timing['load_s']:.1f}s, compute {timing['compute_s']:.1f}s), peak {timing['peak_rss_mb']:.0f} MB"
+                else:
+                    line += f" - {timing['error']}"
+                print(line)
+
+                # rewritten after every run, so long benchmarks leave a usable report behind when interrupted
+                with open(report, 'w') as fw:
+                    json.dump(results, fw, indent=2)
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the analysis scripts on synthetic data at several scales")
+    parser.add_argument('--scales', type=float, nargs='*', default=[1, 10, 100], help="multiples of the videos per snapshot")
+    parser.add_argument('--scripts', nargs='*', default=SCRIPTS)
+    parser.add_argument('--work', default=path, help="directory for generated data, runs and caches")
+    parser.add_argument('--report', default=report_file)
+    parser.add_argument('--timeout', type=float, help="seconds before a script run is abandoned")
+    parser.add_argument('--topics', nargs='*')
+    parser.add_argument('--snapshots', type=int, default=16)
+    parser.add_argument('--videos', type=int, default=750, help="videos per snapshot at scale 1")
+    parser.add_argument('--churn', type=float, default=0.1)
+    parser.add_argument('--comments', type=float, default=5.0)
+    parser.add_argument('--seed', type=int, default=0)
+    # internal: a single script run, started by run()
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    parser.add_argument('--data', help=argparse.SUPPRESS)
+    parser.add_argument('--cache', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_script(args.run, args.data, args.cache, args.result)
+    else:
+        settings = {'topics': args.topics, 'snapshots': args.snapshots, 'videos': args.videos, 'churn': args.churn,
+                    'comments': args.comments, 'seed': args.seed}
+        benchmark(args.scales, args.scripts, args.work, args.report, settings, args.timeout)
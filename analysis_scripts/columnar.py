@@ -0,0 +1,210 @@
+import argparse
+import os
+from datetime import datetime
+import ndjson_io
+from snapshots import parse_date
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+# columnar copy of the NDJSON snapshots: data/<topic>/<date>_<kind>.ndjson -> store/<topic>/<date>_<kind>.parquet
+# only the flattened columns below are kept, typed, so analyses read a couple of columns instead of parsing every record
+
+path = "/data/"
+store_path = "/data/columnar/"
+
+KINDS = ('videos', 'details', 'channels', 'metadata', 'threads', 'comments')
+
+# column -> (path into the raw record, type); '*' in a path maps over a list, e.g. a thread's replies
+COLUMNS = {
+    'videos': {
+        'video_id': (('id', 'videoId'), 'string'),
+        'channel_id': (('snippet', 'channelId'), 'string'),
+        'published_at': (('snippet', 'publishedAt'), 'timestamp'),
+    },
+    'details': {
+        'id': (('id',), 'string'),
+        'channel_id': (('snippet', 'channelId'), 'string'),
+        'published_at': (('snippet', 'publishedAt'), 'timestamp'),
+        'category_id': (('snippet', 'categoryId'), 'string'),
+        'duration': (('contentDetails', 'duration'), 'string'),
+        'definition': (('contentDetails', 'definition'), 'string'),
+        'view_count': (('statistics', 'viewCount'), 'int'),
+        'like_count': (('statistics', 'likeCount'), 'int'),
+        'comment_count': (('statistics', 'commentCount'), 'int'),
+        'favorite_count': (('statistics', 'favoriteCount'), 'int'),
+    },
+    'channels': {
+        'id': (('id',), 'string'),
+        'published_at': (('snippet', 'publishedAt'), 'timestamp'),
+        'country': (('snippet', 'country'), 'string'),
+        'view_count': (('statistics', 'viewCount'), 'int'),
+        'subscriber_count': (('statistics', 'subscriberCount'), 'int'),
+        'video_count': (('statistics', 'videoCount'), 'int'),
+    },
+    'metadata': {
+        'total_results': (('pageInfo', 'totalResults'), 'int'),
+        'results_per_page': (('pageInfo', 'resultsPerPage'), 'int'),
+        'next_page_token': (('nextPageToken',), 'string'),
+        'region_code': (('regionCode',), 'string'),
+        'query_time': (('query_time',), 'timestamp'),
+        'published_after': (('query', 'publishedAfter'), 'timestamp'),
+        'published_before': (('query', 'publishedBefore'), 'timestamp'),
+    },
+    'threads': {
+        'id': (('id',), 'string'),
+        'video_id': (('snippet', 'videoId'), 'string'),
+        'published_at': (('snippet', 'topLevelComment', 'snippet', 'publishedAt'), 'timestamp'),
+        'total_reply_count': (('snippet', 'totalReplyCount'), 'int'),
+        'reply_ids': (('replies', 'comments', '*', 'id'), 'string_list'),
+        'reply_published_at': (('replies', 'comments', '*', 'snippet', 'publishedAt'), 'timestamp_list'),
+    },
+    'comments': {
+        'id': (('id',), 'string'),
+        'parent_id': (('snippet', 'parentId'), 'string'),
+        'published_at': (('snippet', 'publishedAt'), 'timestamp'),
+        'author_channel_id': (('snippet', 'authorChannelId', 'value'), 'string'),
+    },
+}
+
+rows_per_group = 100000  # records parsed before a row group is written, bounds memory on large thread/comment files
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("The columnar store needs pyarrow (pip install pyarrow)")
+
+
+def arrow_type(kind: str):
+    return {'string': pa.string(),
+            'int': pa.int64(),
+            'timestamp': pa.timestamp('s', tz='UTC'),
+            'string_list': pa.list_(pa.string()),
+            'timestamp_list': pa.list_(pa.timestamp('s', tz='UTC'))}[kind]
+
+
+def schema(kind: str):
+    require_pyarrow()
+    return pa.schema([(name, arrow_type(col_type)) for name, (_, col_type) in COLUMNS[kind].items()])
+
+
+def convert_value(value, col_type: str):
+    if value is None:
+        return [] if col_type.endswith('_list') else None
+    if col_type == 'int':
+        return int(value)  # statistics are strings in the API responses
+    if col_type == 'timestamp':
+        return datetime.fromisoformat(value)
+    if col_type == 'timestamp_list':
+        return [datetime.fromisoformat(elem) if elem else None for elem in value]
+    return value
+
+
+def snapshot_name(file: str, kind: str):
+    # "<date>" of a "<date>_<kind>.ndjson[.gz|.zst]" file name, None for other files
+    name = ndjson_io.plain_name(file)
+    suffix = f"_{kind}.ndjson"
+    return name.removesuffix(suffix) if name.endswith(suffix) else None
+
+
+def convert_file(source: str, target: str, kind: str):
+    require_pyarrow()
+    columns = COLUMNS[kind]
+    table_schema = schema(kind)
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_target = target + '.tmp'
+
+    with pq.ParquetWriter(tmp_target, table_schema, compression='zstd') as writer:
+        batch = {name: [] for name in columns}
+
+        def write_batch():
+            writer.write_table(pa.table({name: pa.array(values, type=table_schema.field(name).type) for name, values in batch.items()}, schema=table_schema))
+            for values in batch.values():
+                values.clear()
+
+        reader = ndjson_io.FieldReader([field_path for field_path, _ in columns.values()])
+        with ndjson_io.open_ndjson(source, binary=True) as f:
+            for line in f:
+                for (name, (_, col_type)), value in zip(columns.items(), reader(line)):
+                    batch[name].append(convert_value(value, col_type))
+
+                if len(batch[next(iter(columns))]) >= rows_per_group:
+                    write_batch()
+
+        write_batch()
+
+    os.replace(tmp_target, target)
+
+
+def store_file(topic: str, date: str, kind: str, store: str=store_path):
+    return os.path.join(store, topic, f"{date}_{kind}.parquet")
+
+
+def is_stale(source: str, target: str):
+    return not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source)
+
+
+def convert(data_path: str=path, store: str=store_path, topics=None, kinds=KINDS, force: bool=False):
+    # convert every snapshot file that has no columnar copy yet or changed since it was converted
+    converted = []
+    if not topics:
+        # every topic directory, except the store itself when it lives inside the data directory
+        topics = [topic for topic in sorted(os.listdir(data_path)) if os.path.isdir(os.path.join(data_path, topic))
+                  and os.path.realpath(os.path.join(data_path, topic)) != os.path.realpath(store)]
+
+    for topic in topics:
+        topicpath = os.path.join(data_path, topic)
+        for file in sorted(os.listdir(topicpath)):
+            for kind in kinds:
+                date = snapshot_name(file, kind)
+                if date is None:
+                    continue
+
+                source = os.path.join(topicpath, file)
+                target = store_file(topic, date, kind, store)
+                if force or is_stale(source, target):
+                    print(f"Converting {source}")
+                    convert_file(source, target, kind)
+                    converted.append(target)
+
+    return converted
+
+
+def snapshots(topic: str, kind: str, store: str=store_path):
+    # "<date>" names of the converted snapshots of one topic and kind, in date order (as snapshots.discover)
+    topicpath = os.path.join(store, topic)
+    if not os.path.isdir(topicpath):
+        return []
+
+    suffix = f"_{kind}.parquet"
+    return sorted((file.removesuffix(suffix) for file in os.listdir(topicpath) if file.endswith(suffix)), key=parse_date)
+
+
+def load_table(topic: str, date: str, kind: str, columns=None, store: str=store_path):
+    # Arrow table holding only the requested columns of one snapshot file
+    require_pyarrow()
+    return pq.read_table(store_file(topic, date, kind, store), columns=columns)
+
+
+def load_columns(topic: str, date: str, kind: str, columns=None, store: str=store_path):
+    # same as load_table, as a pandas DataFrame
+    return load_table(topic, date, kind, columns, store).to_pandas()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert NDJSON snapshots into the columnar (Parquet) store")
+    parser.add_argument('--data', default=path, help="directory holding one subdirectory per topic")
+    parser.add_argument('--store', default=store_path, help="output directory of the columnar store")
+    parser.add_argument('--topics', nargs='*', help="topics to convert (default: every topic directory)")
+    parser.add_argument('--kinds', nargs='*', default=KINDS, choices=KINDS, help="snapshot file kinds to convert")
+    parser.add_argument('--force', action='store_true', help="reconvert files that are already up to date")
+    args = parser.parse_args()
+
+    done = convert(args.data, args.store, args.topics, args.kinds, args.force)
+    print(f"{len(done)} files converted")
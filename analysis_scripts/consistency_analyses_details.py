@@ -1,16 +1,6 @@
-import json
-import os
 import matplotlib.pyplot as plt
-from datetime import datetime
-from collections import OrderedDict
-import pandas as pd
 from pandas.plotting import parallel_coordinates
-
-
-def jaccard_index(set1, set2):
-    overlap = len(set1.intersection(set2))
-    total_n = len(set1.union(set2))
-    return overlap/total_n
+import coverage
 
 
 topics = ['blm', 'brexit', 'capriot', 'grammys', 'higgs', 'worldcup']
@@ -26,75 +16,10 @@ ver_idx = 0
 for topic in topics:
     topicpath = f"{path}/{topic}/"
 
-    vid_ids = {}
-
-    for file in os.listdir(topicpath):
-        if file.endswith("_videos.ndjson"):
-            date = file.strip("_videos.ndjson")
-            date = datetime.strptime(date, "%b_%d").replace(year=2025)
-
-            vid_ids[date] = set()
-            with open(os.path.join(topicpath, file), 'r') as f:
-                for line in f:
-                    raw = json.loads(line)
-                    vid_ids[date].add(raw['id']['videoId'])
-
-    vid_ids = OrderedDict(sorted(vid_ids.items()))
-    curr_key = list(vid_ids.keys())[0]
-
-    comps = 1
-    pd_dict = {'id': [], 't-1': [], 't': [], 'jac_prev': [], 'jac_start': []}
-
-    for date in vid_ids:
-        if date == curr_key:  # log starting set and ignore first key
-            start_set = vid_ids[curr_key]
-            filename_start = curr_key.strftime("%b_%d").lower() + "_details.ndjson"
-            continue
-
-        common_ids = vid_ids[date].intersection(vid_ids[curr_key])
-        common_start = vid_ids[date].intersection(start_set)
-        
-        filename1 = curr_key.strftime("%b_%d").lower() + "_details.ndjson"
-        filename2 = date.strftime("%b_%d").lower() + '_details.ndjson'
-
-        totals_f1 = set()
-        totals_f2 = set()
-        totals_startcomp = set()
-        totals_startstr = set()
-
-        with open(os.path.join(topicpath, filename1), 'r') as f:
-            for line in f:
-                raw = json.loads(line)
-                if raw['id'] in common_ids:
-                    totals_f1.add(raw['id'])
-        
-        with open(os.path.join(topicpath, filename2), 'r') as f:
-            for line in f:
-                raw = json.loads(line)
-                if raw['id'] in common_ids:
-                    totals_f2.add(raw['id'])
-                if raw['id'] in common_start:
-                    totals_startcomp.add(raw['id'])
-
-        with open(os.path.join(topicpath, filename_start), 'r') as f:
-            for line in f:
-                raw = json.loads(line)
-                if raw['id'] in common_start:
-                    totals_startstr.add(raw['id'])
-
-        print(f"{topic}: {len(common_start.union(totals_f2))}, Comp ID: {comps}")
-
-        pd_dict['id'].append(comps)
-        pd_dict['t-1'].append(len(totals_f1)/len(common_ids))
-        pd_dict['t'].append(len(totals_f2)/len(common_ids))
-        pd_dict['jac_prev'].append(jaccard_index(totals_f1, totals_f2))
-        pd_dict['jac_start'].append(jaccard_index(totals_startcomp, totals_startstr))
-
-        curr_key = date
-
-        comps += 1
-    
-    pd_df = pd.DataFrame.from_dict(pd_dict)
+    # coverage of every snapshot against the previous and the first one, cached per topic until a snapshot changes
+    pd_df = coverage.coverage_table(topicpath)
+    for comp, covered in zip(pd_df['id'], pd_df.pop('start_union')):
+        print(f"{topic}: {covered}, Comp ID: {comp}")
 
     ax = axs[hor_idx][ver_idx]
     parallel_coordinates(pd_df, 'id', ax=ax, colormap='rainbow')
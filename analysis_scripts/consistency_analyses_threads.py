@@ -2,10 +2,9 @@ import json
 import os
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
-from collections import OrderedDict
-from tqdm import tqdm
-import subprocess
 import pandas as pd
+import scanner
+import snapshots
 
 
 def jaccard_index(set1, set2):
@@ -17,12 +16,37 @@ def jaccard_index(set1, set2):
         return None
 
 
-def count_lines(filepath):
-    result = subprocess.run(['wc', '-l', filepath], capture_output=True, text=True)
-    if result.returncode == 0:
-        return int(result.stdout.strip().split()[0])
-    else:
-        raise RuntimeError(f"Error counting lines: {result.stderr}")
+# only these fields of each thread / reply record are parsed
+THREAD_FIELDS = ['id', 'snippet.videoId', 'snippet.totalReplyCount', 'snippet.topLevelComment.snippet.publishedAt', 'replies.comments.*.id', 'replies.comments.*.snippet.publishedAt']
+COMMENT_FIELDS = ['id', 'snippet.parentId', 'snippet.publishedAt']
+
+
+def thread_record(values):
+    # IDs of the thread and of its replies posted before datefilter, also under *_s when the video is a shared one
+    idx, video_id, reply_count, published, reply_ids, reply_times = values
+    if datetime.fromisoformat(published) < datefilter:
+        yield 'toplevel', idx
+        if video_id in shared_vids:
+            yield 'toplevel_s', idx
+
+    if reply_count > 0:
+        if reply_ids is None:
+            print(f"Error encountered at videoId {idx}")
+            return
+        for reply_id, reply_time in zip(reply_ids, reply_times):
+            if datetime.fromisoformat(reply_time) < datefilter:
+                yield 'nested', reply_id
+                if video_id in shared_vids:
+                    yield 'nested_s', reply_id
+
+
+def comment_record(values):
+    # IDs of replies posted before datefilter, also under nested_s when their thread is one of toplevel_s
+    idx, parent_id, published = values
+    if datetime.fromisoformat(published) < datefilter:
+        yield 'nested', idx
+        if parent_id in toplevel_s:
+            yield 'nested_s', idx
 
 
 with open('queries.json', 'r') as f:
@@ -37,128 +61,36 @@ for topic in topics:
     topicpath = f"{path}/{topic}/"
     print(f"{topic}\n{'-'*15}")
 
-    dates = []
-    vid_ids = {}
-
-    for file in os.listdir(topicpath):
-        if file.endswith("_threads.ndjson"):
-            date = file.removesuffix("_threads.ndjson")
-            date = datetime.strptime(date, "%b_%d").replace(year=2025)
-            dates.append(date)
+    video_files = snapshots.discover(topicpath, 'videos')
+    thread_files = snapshots.discover(topicpath, 'threads')
+    comment_files = snapshots.discover(topicpath, 'comments')
+    dates = list(thread_files)
 
-    dates.sort()
-    first_vids = dates[0].strftime("%b_%d").lower() + "_videos.ndjson"
-    last_vids = dates[-1].strftime("%b_%d").lower() + "_videos.ndjson"
-
-    first_set = set()
-    last_set = set()
-
-    with open(os.path.join(topicpath, first_vids), 'r') as f:
-        for line in f:
-            raw = json.loads(line)
-            first_set.add(raw['id']['videoId'])
-    
-    with open(os.path.join(topicpath, last_vids), 'r') as f:
-        for line in f:
-            raw = json.loads(line)
-            last_set.add(raw['id']['videoId'])
+    first_set = set(snapshots.read_fields(video_files[dates[0]], ['id.videoId'])['id.videoId'])
+    last_set = set(snapshots.read_fields(video_files[dates[-1]], ['id.videoId'])['id.videoId'])
 
     shared_vids = first_set.intersection(last_set)
 
-    first_threads = dates[0].strftime("%b_%d").lower() + "_threads.ndjson"
-    first_comments = dates[0].strftime("%b_%d").lower() + "_comments.ndjson"
-    last_threads = dates[-1].strftime("%b_%d").lower() + "_threads.ndjson"
-    last_comments = dates[-1].strftime("%b_%d").lower() + "_comments.ndjson"
-
-    first_toplevel = set()
-    first_nested = set()
-    last_toplevel = set()
-    last_nested = set()
-
-    # print(len(first_toplevel.union(first_nested)))
+    datefilter = datetime.fromisoformat(queries[topic]["focal_date"]) + timedelta(days=21)  # 3 weeks after focal date to allow comment consolidation
 
-    first_toplevel_s = set()
-    first_nested_s = set()
-    last_toplevel_s = set()
-    last_nested_s = set()
+    # thread and reply IDs of the first and last collection; the thread scan runs first, since which replies count
+    # as shared depends on the shared threads (toplevel_s, read by comment_record)
+    collected = dict()
+    for date in (dates[0], dates[-1]):
+        threads = scanner.scan(thread_files[date], thread_record, fields=THREAD_FIELDS, desc=f"Processing {os.path.basename(thread_files[date])}")
+        toplevel_s = threads['toplevel_s']
+        comments = scanner.scan(comment_files[date], comment_record, fields=COMMENT_FIELDS, desc=f"Processing {os.path.basename(comment_files[date])}")
 
-    datefilter = datetime.fromisoformat(queries[topic]["focal_date"]) + timedelta(days=21)  # 3 weeks after focal date to allow comment consolidation
+        collected[date] = {'toplevel': threads['toplevel'], 'toplevel_s': threads['toplevel_s'],
+                           'nested': threads['nested'] | comments['nested'], 'nested_s': threads['nested_s'] | comments['nested_s']}
 
-    curr_file = os.path.join(topicpath, first_threads)
-
-    with tqdm(total=count_lines(curr_file), desc=f"Processing {first_threads}") as pbar:
-        with open(os.path.join(topicpath, first_threads), 'r') as f:
-            for line in f:
-                raw = json.loads(line)
-                toplevel = raw['snippet']['topLevelComment']
-                if datetime.fromisoformat(toplevel['snippet']['publishedAt']) < datefilter:
-                    first_toplevel.add(raw['id'])
-                    if raw['snippet']['videoId'] in shared_vids:
-                        first_toplevel_s.add(raw['id'])
-
-                if raw['snippet']['totalReplyCount'] > 0:
-                    for reply in raw['replies']['comments']:
-                        if datetime.fromisoformat(reply['snippet']['publishedAt']) < datefilter:
-                            first_nested.add(reply['id'])
-                            if raw['snippet']['videoId'] in shared_vids:
-                                first_nested_s.add(reply['id'])
-
-                pbar.update(1)
-
-    curr_file = os.path.join(topicpath, first_comments)
-
-    with tqdm(total=count_lines(curr_file), desc=f"Processing {first_comments}") as pbar:
-        with open(os.path.join(topicpath, first_comments), 'r') as f:
-            for line in f:
-                raw = json.loads(line)
-                if datetime.fromisoformat(raw['snippet']['publishedAt']) < datefilter:
-                    first_nested.add(raw['id'])
-                    if raw['snippet']['parentId'] in first_toplevel_s:
-                        first_nested_s.add(raw['id'])
-                pbar.update(1)
-
-    curr_file = os.path.join(topicpath, last_threads)
-
-    with tqdm(total=count_lines(curr_file), desc=f"Processing {last_threads}") as pbar:
-        with open(os.path.join(topicpath, last_threads), 'r') as f:
-            for line in f:
-                raw = json.loads(line)
-                toplevel = raw['snippet']['topLevelComment']
-                if datetime.fromisoformat(toplevel['snippet']['publishedAt']) < datefilter:
-                    last_toplevel.add(raw['id'])
-                    if raw['snippet']['videoId'] in shared_vids:
-                        last_toplevel_s.add(raw['id'])
-
-                if raw['snippet']['totalReplyCount'] > 0:
-                    try:
-                        for reply in raw['replies']['comments']:
-                            if datetime.fromisoformat(reply['snippet']['publishedAt']) < datefilter:
-                                last_nested.add(reply['id'])
-                                if raw['snippet']['videoId'] in shared_vids:
-                                    last_nested_s.add(reply['id'])
-                    except KeyError:
-                        print(f"Error encountered at videoId {raw['id']}")
-
-
-                pbar.update(1)
-
-    curr_file = os.path.join(topicpath, last_comments)
-
-    with tqdm(total=count_lines(curr_file), desc=f"Processing {last_comments}") as pbar:
-        with open(os.path.join(topicpath, last_comments), 'r') as f:
-            for line in f:
-                raw = json.loads(line)
-                if datetime.fromisoformat(raw['snippet']['publishedAt']) < datefilter:
-                    last_nested.add(raw['id'])
-                    if raw['snippet']['parentId'] in last_toplevel_s:
-                        last_nested_s.add(raw['id'])
-                pbar.update(1)
+    first, last = collected[dates[0]], collected[dates[-1]]
 
     jaccard_dict['topic'].append(topic)
-    jaccard_dict['sim_t_ns'].append(jaccard_index(first_toplevel, last_toplevel))
-    jaccard_dict['sim_n_ns'].append(jaccard_index(first_nested, last_nested))
-    jaccard_dict['sim_t_s'].append(jaccard_index(first_toplevel_s, last_toplevel_s))
-    jaccard_dict['sim_n_s'].append(jaccard_index(first_nested_s, last_nested_s))
+    jaccard_dict['sim_t_ns'].append(jaccard_index(first['toplevel'], last['toplevel']))
+    jaccard_dict['sim_n_ns'].append(jaccard_index(first['nested'], last['nested']))
+    jaccard_dict['sim_t_s'].append(jaccard_index(first['toplevel_s'], last['toplevel_s']))
+    jaccard_dict['sim_n_s'].append(jaccard_index(first['nested_s'], last['nested_s']))
 
     print('-'*15)
 
@@ -3,17 +3,9 @@ import pandas as pd
 import numpy as np
 from scipy import stats
 from datetime import datetime, timedelta
-from collections import OrderedDict
-import os
 import warnings
-
-def jaccard_index(set1, set2):
-    overlap = len(set1.intersection(set2))
-    total_n = len(set1.union(set2))
-    try:
-        return overlap/total_n
-    except ZeroDivisionError:
-        return 1.0
+import snapshots
+from timebuckets import TimeBuckets
 
 
 warnings.filterwarnings("ignore")
@@ -32,45 +24,17 @@ descriptives = {'topic': [], 'mode': [], 'mean': [], 'min': [], 'max': [], '1qr'
 for topic in topics:
     topicpath = f"{path}/{topic}/"
 
-    topic_dfs_hourly = dict()
-
     min_date = datetime.fromisoformat(query_info[topic]['focal_date']) - timedelta(days=onetailed_span)
     max_date = datetime.fromisoformat(query_info[topic]['focal_date']) + timedelta(days=onetailed_span)
 
-    for file in os.listdir(topicpath):
-        if file.endswith("_videos.ndjson"):
-            date = file.strip("_videos.ndjson")
-            date = datetime.strptime(date, "%b_%d").replace(year=2025)
-
-            topic_dfs_hourly[date] = []
-            with open(os.path.join(topicpath, file), 'r') as f:
-                for line in f:
-                    raw = json.loads(line)
-                    topic_dfs_hourly[date].append([raw['id']['videoId'], raw['snippet']['publishedAt']])
-
-                # hacky way to force date boundaries
-                topic_dfs_hourly[date].append(['plch', min_date])
-                topic_dfs_hourly[date].append(['plch', max_date])
-
-    topic_dfs_hourly = OrderedDict(sorted(topic_dfs_hourly.items()))
-
-    for key in topic_dfs_hourly:
-        topic_dfs_hourly[key] = pd.DataFrame(topic_dfs_hourly[key], columns=['id', 'pubtime'])
-        topic_dfs_hourly[key]['pubtime'] = pd.to_datetime(topic_dfs_hourly[key]['pubtime'])
-        colname = key.strftime("%b_%d")
-        # aggregate all video ids per hour they were posted
-        topic_dfs_hourly[key] = topic_dfs_hourly[key].groupby(pd.Grouper(key='pubtime', freq='1h')).agg(idset=('id', lambda x: set(x)))
-        topic_dfs_hourly[key].rename(columns={'idset': colname}, inplace=True)
-        # remove the artificial count on min and max that was introduced to force date boundaries (first and last indices)
-        topic_dfs_hourly[key][colname][0].remove('plch')
-        topic_dfs_hourly[key][colname].iloc[-1].remove('plch')
-
-    # merge all dates to compare
-    topic_dfs_hourly = pd.concat(list(topic_dfs_hourly.values()), axis=1).loc[:, ~pd.concat(list(topic_dfs_hourly.values()), axis=1).columns.duplicated()]
-    # get hourly jaccard similarity between first and last collection; write it at the end so we can perform count averaging
-    jac_sim = [jaccard_index(first, last) for first, last in zip(topic_dfs_hourly.iloc[:, 0], topic_dfs_hourly.iloc[:, -1])]
-
-    topic_dfs_hourly = topic_dfs_hourly.applymap(len)
+    # bucket all video ids per hour they were posted, between the date boundaries
+    videos = snapshots.load_fields(topicpath, 'videos', ['id.videoId', 'snippet.publishedAt'])
+    buckets = TimeBuckets({date: (columns['id.videoId'], columns['snippet.publishedAt']) for date, columns in videos.items()}, min_date, max_date, timedelta(hours=1))
+
+    # hourly video counts, one column per collection date
+    topic_dfs_hourly = buckets.frame()
+    # get hourly jaccard similarity between first and last collection
+    jac_sim = list(buckets.jaccard(0, -1))
 
     avg_count = list(topic_dfs_hourly.mean(axis=1, numeric_only=True))
     corr_df = pd.DataFrame([avg_count, jac_sim]).T 
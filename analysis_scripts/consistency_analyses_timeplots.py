@@ -3,19 +3,10 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
-from collections import OrderedDict
-import os
 import warnings
 import seaborn as sns
-
-
-def jaccard_index(set1, set2):
-    overlap = len(set1.intersection(set2))
-    total_n = len(set1.union(set2))
-    try:
-        return overlap/total_n
-    except ZeroDivisionError:
-        return 1.0
+import snapshots
+from timebuckets import TimeBuckets
 
 
 warnings.filterwarnings("ignore")
@@ -38,45 +29,17 @@ onetailed_span = 14
 for topic in topics:
     topicpath = f"{path}/{topic}/"
 
-    topic_dfs_daily = dict()
-
     min_date = datetime.fromisoformat(query_info[topic]['focal_date']) - timedelta(days=onetailed_span)
     max_date = datetime.fromisoformat(query_info[topic]['focal_date']) + timedelta(days=onetailed_span)
 
-    for file in os.listdir(topicpath):
-        if file.endswith("_videos.ndjson"):
-            date = file.strip("_videos.ndjson")
-            date = datetime.strptime(date, "%b_%d").replace(year=2025)
-
-            topic_dfs_daily[date] = []
-            with open(os.path.join(topicpath, file), 'r') as f:
-                for line in f:
-                    raw = json.loads(line)
-                    topic_dfs_daily[date].append([raw['id']['videoId'], raw['snippet']['publishedAt']])
-
-                # hacky way to force date boundaries
-                topic_dfs_daily[date].append(['plch', min_date])
-                topic_dfs_daily[date].append(['plch', max_date])
-
-    topic_dfs_daily = OrderedDict(sorted(topic_dfs_daily.items()))
-
-    for key in topic_dfs_daily:
-        topic_dfs_daily[key] = pd.DataFrame(topic_dfs_daily[key], columns=['id', 'pubtime'])
-        topic_dfs_daily[key]['pubtime'] = pd.to_datetime(topic_dfs_daily[key]['pubtime'])
-        colname = key.strftime("%b_%d")
-        # aggregate all video ids per hour they were posted
-        topic_dfs_daily[key] = topic_dfs_daily[key].groupby(pd.Grouper(key='pubtime', freq='1D')).agg(idset=('id', lambda x: set(x)))
-        topic_dfs_daily[key].rename(columns={'idset': colname}, inplace=True)
-        # remove the artificial count on min and max that was introduced to force date boundaries (first and last indices)
-        topic_dfs_daily[key][colname][0].remove('plch')
-        topic_dfs_daily[key][colname].iloc[-1].remove('plch')
-
-    # merge all dates to compare
-    topic_dfs_daily = pd.concat(list(topic_dfs_daily.values()), axis=1).loc[:, ~pd.concat(list(topic_dfs_daily.values()), axis=1).columns.duplicated()]
-
-    # get hourly jaccard similarity between first and last collection; write it at the end so we can perform count averaging
-    jac_sims = [jaccard_index(first, last) for first, last in zip(topic_dfs_daily.iloc[:, 0], topic_dfs_daily.iloc[:, -1])]
-    topic_dfs_daily = topic_dfs_daily.applymap(len)
+    # bucket all video ids per day they were posted, between the date boundaries
+    videos = snapshots.load_fields(topicpath, 'videos', ['id.videoId', 'snippet.publishedAt'])
+    buckets = TimeBuckets({date: (columns['id.videoId'], columns['snippet.publishedAt']) for date, columns in videos.items()}, min_date, max_date, timedelta(days=1))
+
+    # daily video counts, one column per collection date
+    topic_dfs_daily = buckets.frame()
+    # get daily jaccard similarity between first and last collection; write it at the end so we can perform count averaging
+    jac_sims = buckets.jaccard(0, -1)
 
     first_date = topic_dfs_daily.columns[0]
     last_date = topic_dfs_daily.columns[-1]
@@ -0,0 +1,79 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import snapshots
+from overlap import pack_arrays
+from presence import IdIndex, popcount
+
+
+# details-coverage of consecutive snapshots: of the videos two collections share, how many the details API returned
+# on each; every videos and details snapshot is read once into a packed presence row over one shared ID index, so all
+# comparisons are bitwise ANDs of rows and popcounts
+
+cache_dir = "./cache/coverage/"  # per-topic tables, keyed by the fingerprint of their input files; None disables
+
+# columns of the coverage table, in the order the parallel-coordinates plot draws them
+COLUMNS = ['id', 't-1', 't', 'jac_prev', 'jac_start']
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+class DetailsCoverage:
+    # videos, details: date -> IDs of the videos / details snapshot of that date; details needs every video date
+    def __init__(self, videos, details):
+        self.dates = list(videos)
+        self.index = IdIndex()
+        video_codes = [self.index.encode(list(videos[date])) for date in self.dates]
+        detail_codes = [self.index.encode(list(details[date])) for date in self.dates]
+
+        self.videos = pack_arrays(video_codes, len(self.index))
+        self.details = pack_arrays(detail_codes, len(self.index))
+
+    def table(self):
+        # one row per comparison of a snapshot (t) with the one before it (t-1), numbered from 1:
+        #   t-1, t     share of the videos both snapshots hold that have details at t-1 / at t
+        #   jac_prev   Jaccard of those two detailed sets
+        #   jac_start  Jaccard of the details at t and at the first snapshot, over the videos those two share
+        #   start_union  videos shared with the first snapshot or detailed among those shared with t-1
+        videos, details = self.videos, self.details
+        common = videos[1:] & videos[:-1]
+        common_start = videos[1:] & videos[0]
+
+        prev_detailed = details[:-1] & common
+        curr_detailed = details[1:] & common
+        start_comp = details[1:] & common_start
+        start_str = details[0] & common_start
+
+        n_common = popcount(common, axis=1)
+        return pd.DataFrame({
+            'id': np.arange(1, len(self.dates)),
+            't-1': _ratio(popcount(prev_detailed, axis=1), n_common),
+            't': _ratio(popcount(curr_detailed, axis=1), n_common),
+            'jac_prev': _ratio(popcount(prev_detailed & curr_detailed, axis=1), popcount(prev_detailed | curr_detailed, axis=1)),
+            'jac_start': _ratio(popcount(start_comp & start_str, axis=1), popcount(start_comp | start_str, axis=1)),
+            'start_union': popcount(common_start | curr_detailed, axis=1),
+        })
+
+
+def coverage_table(topicpath: str):
+    # DetailsCoverage(...).table() of one topic, recomputed only when one of its snapshots changes
+    files = list(snapshots.discover(topicpath, 'videos').values()) + list(snapshots.discover(topicpath, 'details').values())
+    cache_file = os.path.join(cache_dir, f"{snapshots.fingerprint(files)}.pickle") if cache_dir else None
+
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+
+    table = DetailsCoverage(snapshots.load_ids(topicpath, 'videos'), snapshots.load_ids(topicpath, 'details')).table()
+
+    if cache_file:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_file + '.tmp', 'wb') as fw:
+            pickle.dump(table, fw, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cache_file + '.tmp', cache_file)
+
+    return table
@@ -1,91 +1,62 @@
-import json
 import pandas as pd
 import numpy as np
-import os
-from collections import OrderedDict, defaultdict, Counter
-from datetime import datetime, timedelta
-from tqdm import tqdm
+from collections import OrderedDict
 import matplotlib.pyplot as plt
-
-
-def markov_transitions(data, order=1):
-    # data should be the transition matrix as np.array
-    transition_counts = defaultdict(Counter)
-
-    for row in data:
-        row = list(row)
-        for i in range(len(row) - order):
-            state = tuple(row[i:i+order])
-            next_state = row[i + order]
-            transition_counts[state][next_state] += 1
-
-    # Normalize to probabilities
-    transition_probs = {
-        state: {k: v / sum(nexts.values()) for k, v in nexts.items()}
-        for state, nexts in transition_counts.items()
-    }
-
-    return transition_probs
+import snapshots
+from presence import PresenceMatrix
+import markov
 
 
 topics = ['blm', 'brexit', 'capriot', 'grammys', 'higgs', 'worldcup']
 
 path = "/data/"
 
+order = 2  # number of previous snapshots a video's next presence is conditioned on
+n_boot = 1000  # bootstrap resamples for the transition probability confidence intervals
+
 vid_ids = {}
+topic_ids = {}
 
 for topic in topics:
     topicpath = f"{path}/{topic}/"
 
-    for file in os.listdir(topicpath):
-        if file.endswith("_videos.ndjson"):
-            date = file.strip("_videos.ndjson")
-            date = datetime.strptime(date, "%b_%d").replace(year=2025)
-
-            if date not in vid_ids:
-                vid_ids[date] = set()
-            with open(os.path.join(topicpath, file), 'r') as f:
-                for line in f:
-                    raw = json.loads(line)
-                    vid_ids[date].add(raw['id']['videoId'])
+    topic_ids[topic] = snapshots.load_ids(topicpath)
+    for date, ids in topic_ids[topic].items():
+        if date not in vid_ids:
+            vid_ids[date] = set()
+        vid_ids[date].update(ids)
 
 vid_ids = OrderedDict(sorted(vid_ids.items()))
 
-full_set = set()
-
-for date in vid_ids:
-    full_set = full_set.union(vid_ids[date])
+# videos x snapshots presence (1 = returned in that snapshot), built from bit-packed rows instead of per-cell set lookups
+presence = PresenceMatrix.from_sets(vid_ids)
+transition_matrix = presence.to_dense()
 
-transition_matrix = []
+# per-topic chains plus the pooled chain over all topics' videos; confidence intervals resample videos
+pooled = markov.fit(transition_matrix, order=order, n_boot=n_boot)
+topic_fits = {topic: markov.fit(PresenceMatrix.from_sets(topic_ids[topic]).to_dense(), order=order, n_boot=n_boot) for topic in topics}
 
-with tqdm(total=len(full_set), desc="Building transition matrix") as pbar:
-    for vid in full_set:
-        transitions = []
-        for date in vid_ids:
-            if vid in vid_ids[date]:
-                transitions.append(1)
-            else:
-                transitions.append(0)
-        transition_matrix.append(transitions)
-        pbar.update(1)
+plot_labels = markov.state_labels(order)
+results = {'topic': [], 'state': [], 'next': [], 'count': [], 'prob': [], 'ci_low': [], 'ci_high': []}
 
-transition_matrix = np.array(transition_matrix)
+for topic, fitted in list(topic_fits.items()) + [('pooled', pooled)]:
+    for state, label in enumerate(plot_labels):
+        for nxt, symbol in enumerate(['A', 'P']):
+            results['topic'].append(topic)
+            results['state'].append(label)
+            results['next'].append(symbol)
+            results['count'].append(fitted['counts'][state, nxt])
+            results['prob'].append(fitted['probs'][state, nxt])
+            results['ci_low'].append(fitted['ci_low'][state, nxt])
+            results['ci_high'].append(fitted['ci_high'][state, nxt])
 
-prob_matrix = markov_transitions(transition_matrix, order=2)
+pd.DataFrame.from_dict(results).to_csv(f'./results/dropout_transitions_order{order}.csv', index=False)
 
-plot_labels = []
 states = ['P', 'A']
-plot_map = {1: 'P', 0: 'A'}
-plot_data = []
-
-for key in prob_matrix:
-    label = f"{plot_map[key[0]]}\u2192{plot_map[key[1]]}"
-    plot_data.append([round(prob_matrix[key][1], 3), round(prob_matrix[key][0], 3)])
-    plot_labels.append(label)
-
-plot_data = np.array(plot_data).T
+# rows: next state P, A; columns: the pooled chain's states
+plot_data = np.round(pooled['probs'][:, ::-1].T, 3)
 
-fig, ax = plt.subplots(figsize=(4,6))
+fig, ax = plt.subplots(figsize=(max(4, len(plot_labels)), 6))
 ax.imshow(plot_data, cmap='coolwarm')
 
 ax.set_xticks(range(len(plot_labels)), labels=plot_labels, ha="center", fontsize=12)
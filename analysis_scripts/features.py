@@ -0,0 +1,99 @@
+import hashlib
+import os
+import pickle
+from datetime import datetime, timedelta
+import isodate
+import numpy as np
+import pandas as pd
+import offsets
+import snapshots
+
+
+# per-video regression frame shared by the frequency models (shap_features, video_frequency_predictors): how many
+# snapshots each video appeared in (freq), with its latest details and its channel's latest complete statistics;
+# built per topic and cached on disk, keyed by the fingerprint of the topic's snapshot files
+
+cache_dir = "./cache/features/"  # per-topic frames; None rebuilds them on every run
+
+channel_age_span = 14  # channel age is counted up to this many days after the topic's focal date
+
+DETAIL_FIELDS = {'channel': 'snippet.channelId', 'duration': 'contentDetails.duration', 'quality': 'contentDetails.definition',
+                 'views': 'statistics.viewCount', 'likes': 'statistics.likeCount', 'comments': 'statistics.commentCount'}
+CHANNEL_FIELDS = {'published': 'snippet.publishedAt', 'channel_views': 'statistics.viewCount',
+                  'channel_subs': 'statistics.subscriberCount', 'channel_numvids': 'statistics.videoCount'}
+
+# log1p-scaled numeric columns; frames hold id, the detail columns, channel_age and the channel statistics, freq
+VIDEO_NUMERIC = ['duration', 'views', 'likes', 'comments']
+CHANNEL_NUMERIC = ['channel_age', 'channel_views', 'channel_subs', 'channel_numvids']
+
+KINDS = ('videos', 'details', 'channels')
+
+
+def video_frequencies(topicpath: str):
+    # video ID -> number of snapshots it appeared in, in order of first appearance
+    freq = {}
+    for video_ids in snapshots.load_ids(topicpath).values():
+        for cur_id in video_ids:
+            freq[cur_id] = freq.get(cur_id, 0) + 1
+    return freq
+
+
+def build_topic(topicpath: str, pub_after: datetime):
+    # regression frame of one topic, straight from its snapshots
+    freq = video_frequencies(topicpath)
+
+    details = offsets.latest_fields(snapshots.discover(topicpath, 'details').values(), freq, DETAIL_FIELDS.values())
+    vid_dets = pd.DataFrame(list(details.values()), columns=list(DETAIL_FIELDS), index=pd.Index(list(details), name='id'))
+    vid_dets['duration'] = [isodate.parse_duration(duration).total_seconds() for duration in vid_dets['duration']]
+
+    # channels missing a statistic (e.g. hiding their subscriber count) fall back to their latest complete record
+    channels = offsets.latest_fields(snapshots.discover(topicpath, 'channels').values(), vid_dets['channel'], CHANNEL_FIELDS.values(), complete=True)
+    chan_dets = pd.DataFrame(list(channels.values()), columns=list(CHANNEL_FIELDS), index=pd.Index(list(channels), name='channel'))
+    chan_dets.insert(0, 'channel_age', [(pub_after - datetime.fromisoformat(published)).days for published in chan_dets.pop('published')])
+
+    for frame, numeric in ((vid_dets, VIDEO_NUMERIC), (chan_dets, CHANNEL_NUMERIC)):
+        frame[numeric] = np.log1p(frame[numeric].apply(pd.to_numeric).astype(float))
+
+    # inner joins keep videos that have details, a complete channel and a frequency, in first-appearance order
+    reg_df = vid_dets.reset_index().merge(chan_dets.reset_index(), on='channel')
+    reg_df = reg_df.merge(pd.DataFrame(freq.items(), columns=['id', 'freq']), on='id')
+    reg_df['quality'] = pd.Categorical(reg_df['quality'])
+    return reg_df
+
+
+def _cache_file(topicpath: str, pub_after: datetime):
+    files = [file for kind in KINDS for file in snapshots.discover(topicpath, kind).values()]
+    key = (snapshots.fingerprint(files), pub_after.isoformat(), list(DETAIL_FIELDS.items()), list(CHANNEL_FIELDS.items()))
+    return os.path.join(cache_dir, f"{hashlib.sha1(repr(key).encode()).hexdigest()}.pickle")
+
+
+def topic_features(topicpath: str, pub_after: datetime):
+    # build_topic, cached until one of the topic's videos, details or channels snapshots changes
+    if not cache_dir:
+        return build_topic(topicpath, pub_after)
+
+    cache_file = _cache_file(topicpath, pub_after)
+    if os.path.exists(cache_file):
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+
+    reg_df = build_topic(topicpath, pub_after)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_file + '.tmp', 'wb') as fw:
+        pickle.dump(reg_df, fw, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(cache_file + '.tmp', cache_file)
+    return reg_df
+
+
+def feature_table(path: str, topics, queries):
+    # regression frame of every topic (queries: the focal dates of queries.json), with a categorical topic column
+    frames = []
+    for topic in topics:
+        print(f"Getting {topic.upper()}...")
+        pub_after = datetime.fromisoformat(queries[topic]['focal_date']) + timedelta(days=channel_age_span)
+        reg_df = topic_features(f"{path}/{topic}/", pub_after)
+        frames.append(reg_df.assign(topic=topic))
+
+    full_df = pd.concat(frames, axis=0)
+    full_df['topic'] = pd.Categorical(full_df['topic'])
+    return full_df
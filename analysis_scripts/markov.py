@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+
+# order-k Markov chains over 0/1 presence sequences (IDs x snapshots, e.g. PresenceMatrix.to_dense()):
+# the state at snapshot t is the presence bits of t-k..t-1 packed into an integer (oldest bit first), so
+# counts[state, next] over every ID and position comes out of a single bincount
+
+bootstrap_chunk = 100  # bootstrap replicates per process pool task
+
+
+def encode_states(presence, order: int):
+    # state code of every window of `order` snapshots, shape (IDs, snapshots - order)
+    n_ids, n_snapshots = presence.shape
+    if not 1 <= order < n_snapshots:
+        raise ValueError(f"Markov order must be between 1 and {n_snapshots - 1} for {n_snapshots} snapshots, got {order}")
+    width = n_snapshots - order
+    states = np.zeros((n_ids, width), dtype=np.int64)
+    for offset in range(order):
+        states = (states << 1) | presence[:, offset:offset + width]
+    return states
+
+
+def transition_codes(presence, order: int):
+    # state * 2 + next presence, for every ID and position
+    presence = np.asarray(presence, dtype=np.int64)
+    return encode_states(presence, order) * 2 + presence[:, order:]
+
+
+def transition_counts(presence, order: int=1):
+    # counts[state, next]: how often each order-k state was followed by absence (0) or presence (1)
+    codes = transition_codes(presence, order)
+    return np.bincount(codes.ravel(), minlength=2 ** (order + 1)).reshape(2 ** order, 2)
+
+
+def transition_probs(counts):
+    # counts normalised over the next state; states never observed get nan
+    totals = counts.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(totals > 0, counts / totals, np.nan)
+
+
+def state_labels(order: int, symbols=('A', 'P')):
+    # e.g. order 2: ['A→A', 'A→P', 'P→A', 'P→P'], in state code order
+    return ['→'.join(symbols[(code >> shift) & 1] for shift in range(order - 1, -1, -1)) for code in range(2 ** order)]
+
+
+def pattern_counts(presence, order: int):
+    # distinct presence sequences, how many IDs follow each, and each one's transition counts; resampling IDs is
+    # then resampling patterns, which is far cheaper since most IDs share one of few sequences
+    patterns, frequency = np.unique(np.asarray(presence, dtype=np.uint8), axis=0, return_counts=True)
+    codes = transition_codes(patterns, order)
+    rows = np.repeat(np.arange(len(patterns)), codes.shape[1])
+    per_pattern = np.bincount(rows * 2 ** (order + 1) + codes.ravel(), minlength=len(patterns) * 2 ** (order + 1))
+    return frequency, per_pattern.reshape(len(patterns), 2 ** order, 2)
+
+
+def _bootstrap_chunk(frequency, per_pattern, n_boot: int, seed):
+    # transition probabilities of n_boot resamples of the IDs (with replacement)
+    rng = np.random.default_rng(seed)
+    weights = rng.multinomial(frequency.sum(), frequency / frequency.sum(), size=n_boot)
+    counts = np.einsum('bp,psn->bsn', weights, per_pattern)
+    return transition_probs(counts)
+
+
+def bootstrap_ci(presence, order: int=1, n_boot: int=1000, alpha: float=0.05, workers: int=None, seed: int=0):
+    # percentile confidence intervals of the transition probabilities, resampling IDs; replicates run in fixed-size
+    # chunks on a process pool, each chunk with its own spawned seed, so results do not depend on the worker count
+    frequency, per_pattern = pattern_counts(presence, order)
+
+    # analysis scripts run at module level without a __main__ guard, so workers are forked rather than spawned
+    # (spawning would re-run the calling script); without fork (Windows) the chunks run in this process
+    workers = workers or os.cpu_count() or 1
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        workers = 1
+    chunks = [min(bootstrap_chunk, n_boot - start) for start in range(0, n_boot, bootstrap_chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+
+    if workers == 1:
+        samples = [_bootstrap_chunk(frequency, per_pattern, size, chunk_seed) for size, chunk_seed in zip(chunks, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            samples = list(executor.map(_bootstrap_chunk, [frequency] * len(chunks), [per_pattern] * len(chunks), chunks, seeds))
+
+    samples = np.concatenate(samples)
+    return np.nanpercentile(samples, 100 * alpha / 2, axis=0), np.nanpercentile(samples, 100 * (1 - alpha / 2), axis=0)
+
+
+def fit(presence, order: int=1, n_boot: int=1000, alpha: float=0.05, workers: int=None, seed: int=0):
+    # counts, probabilities and bootstrap confidence bounds, each indexed [state, next]
+    counts = transition_counts(presence, order)
+    ci_low, ci_high = bootstrap_ci(presence, order, n_boot, alpha, workers, seed)
+    return {'counts': counts, 'probs': transition_probs(counts), 'ci_low': ci_low, 'ci_high': ci_high}
@@ -0,0 +1,143 @@
+import gzip
+import json
+import io
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# snapshot files may be written plain or compressed (see collection_scripts/records.py)
+COMPRESSED_EXTS = ('.gz', '.zst')
+
+
+def plain_name(file: str):
+    # file name without its compression extension, e.g. jan_30_videos.ndjson.zst -> jan_30_videos.ndjson
+    for ext in COMPRESSED_EXTS:
+        if file.endswith(ext):
+            return file[:-len(ext)]
+    return file
+
+
+def resolve(path: str):
+    # path as given if it exists, else its compressed counterpart, so callers can keep using .ndjson names
+    if os.path.exists(path):
+        return path
+    for ext in COMPRESSED_EXTS:
+        if os.path.exists(path + ext):
+            return path + ext
+    return path
+
+
+def open_ndjson(path: str, binary: bool=False):
+    # line iterator over a plain, gzip or zstd NDJSON file; binary=True yields undecoded lines, for FieldReader
+    path = resolve(path)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb') if binary else gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError(f"Reading {path} needs the zstandard package (pip install zstandard)")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+        return io.BufferedReader(reader) if binary else io.TextIOWrapper(reader, encoding='utf-8')
+    return open(path, 'rb' if binary else 'r')
+
+
+def loads(line):
+    # one full record (str or bytes line), with orjson when installed
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def extract(raw, field_path):
+    # value at field_path, None where any key is missing; '*' collects the rest of the path from every list element
+    value = raw
+    for depth, key in enumerate(field_path):
+        if key == '*':
+            if value is None:
+                return []
+            return [extract(elem, field_path[depth + 1:]) for elem in value]
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+# lines shorter than this are parsed in full with orjson when installed, which beats on-demand lookups on small records
+small_record = 1024
+
+
+def _getter(field_path):
+    # extract() of one path as a function; paths without '*' index directly, since any miss or non-object gives None
+    if '*' in field_path:
+        return lambda raw: extract(raw, field_path)
+
+    def get(raw):
+        try:
+            for key in field_path:
+                raw = raw[key]
+        except (KeyError, TypeError, IndexError):
+            return None
+        return raw
+    return get
+
+
+def _pointer(field_path):
+    # JSON pointer of a key path, e.g. ('snippet', 'publishedAt') -> '/snippet/publishedAt'
+    return ''.join('/' + key.replace('~', '~0').replace('/', '~1') for key in field_path)
+
+
+class FieldReader:
+    # values at a fixed list of field paths, per NDJSON line: with simdjson installed the line is parsed on demand and
+    # only those values are built; otherwise the record is parsed in full (orjson, else json) and walked with extract
+    def __init__(self, field_paths):
+        self.field_paths = [tuple(field_path) for field_path in field_paths]
+        self.parser = simdjson.Parser() if simdjson is not None else None
+        self.getters = [_getter(field_path) for field_path in self.field_paths]
+
+        # per path: pointer to the value, or for paths through '*' to the list, with the rest to extract per element
+        self.pointers = []
+        for field_path in self.field_paths:
+            star = field_path.index('*') if '*' in field_path else len(field_path)
+            self.pointers.append((_pointer(field_path[:star]), field_path[star:]))
+
+    def _lookup(self, doc, pointer: str, rest):
+        try:
+            value = doc.at_pointer(pointer) if pointer else doc
+        except (KeyError, IndexError, TypeError):
+            # as in extract: a list missing from an existing object maps to [], anything else missing is None
+            if rest:
+                return [] if isinstance(self._lookup(doc, pointer.rsplit('/', 1)[0], ()), dict) else None
+            return None
+
+        if isinstance(value, simdjson.Object):
+            value = value.as_dict()
+        elif isinstance(value, simdjson.Array):
+            value = value.as_list()
+        return extract(value, rest) if rest else value
+
+    def __call__(self, line):
+        # tuple of values in field_paths order; missing keys give None, as in extract
+        if self.parser is None or (orjson is not None and len(line) < small_record):
+            raw = loads(line)
+            return tuple([get(raw) for get in self.getters])
+
+        # the parser reuses its buffer, so everything is copied out (and doc released) before the next line is parsed
+        doc = self.parser.parse(line)
+        if not isinstance(doc, (simdjson.Object, simdjson.Array)):
+            return tuple(extract(doc, field_path) for field_path in self.field_paths)
+        values = tuple(self._lookup(doc, pointer, rest) for pointer, rest in self.pointers)
+        del doc
+        return values
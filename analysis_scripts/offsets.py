@@ -0,0 +1,212 @@
+import argparse
+import mmap
+import os
+import numpy as np
+import ndjson_io
+import snapshots
+
+
+# byte-offset sidecar index of a plain NDJSON snapshot: record ID -> (offset, length) of its line, stored in
+# index_dir, or next to the file as <file>.offsets.npz when built by running this module; lookups then read and parse
+# only the requested lines out of a memory map, instead of scanning the whole file
+
+path = "/data/"
+index_dir = "./cache/offsets/"  # directory for the sidecar files; None keeps each next to its snapshot
+
+SUFFIX = '.offsets.npz'
+
+
+def sidecar_file(file: str):
+    if index_dir is None:
+        return file + SUFFIX
+    digest = snapshots.fingerprint([file])[:12]  # snapshots of different topics share their file names
+    return os.path.join(index_dir, f"{os.path.basename(file)}.{digest}{SUFFIX}")
+
+
+def _source_stat(file: str):
+    stat = os.stat(file)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def _is_stale(target: str, file: str):
+    with np.load(target) as stored:
+        return not np.array_equal(stored['source'], _source_stat(file))
+
+
+def build_index(file: str, id_field: str='id'):
+    # parse every line of file once and write its sidecar: IDs sorted, with the offset and length of their line
+    # (the last one where a snapshot holds an ID more than once, as when reading the file into a dict)
+    if file.endswith(ndjson_io.COMPRESSED_EXTS):
+        raise ValueError(f"Byte offsets need a plain NDJSON file, {file} is compressed")
+
+    reader = ndjson_io.FieldReader([snapshots.field_path(id_field)])
+    lines = {}
+    offset = 0
+    with open(file, 'rb') as f:
+        for line in f:
+            if line.strip():
+                lines[reader(line)[0]] = (offset, len(line))
+            offset += len(line)
+
+    ids = sorted(idx for idx in lines if idx is not None)
+    positions = np.array([lines[idx] for idx in ids], dtype=np.int64).reshape(len(ids), 2)
+
+    target = sidecar_file(file)
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    with open(target + '.tmp', 'wb') as fw:
+        np.savez(fw, ids=np.array(ids, dtype=str), offsets=positions[:, 0], lengths=positions[:, 1], source=_source_stat(file))
+    os.replace(target + '.tmp', target)
+    return target
+
+
+class OffsetIndex:
+    # random access to the records of one snapshot file by ID; the sidecar is (re)built when missing or when the
+    # file changed since it was written
+    def __init__(self, file: str, id_field: str='id'):
+        self.file = ndjson_io.resolve(file)
+        target = sidecar_file(self.file)
+
+        # a current sidecar next to the snapshot (built by running this module) is used wherever index_dir points
+        beside = self.file + SUFFIX
+        if target != beside and os.path.exists(beside) and not _is_stale(beside, self.file):
+            target = beside
+        elif not os.path.exists(target) or _is_stale(target, self.file):
+            build_index(self.file, id_field)
+
+        with np.load(target) as stored:
+            self.ids = stored['ids']
+            self.offsets = stored['offsets']
+            self.lengths = stored['lengths']
+        self._map = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, idx):
+        return bool(self.locate([idx])[0] >= 0)
+
+    def locate(self, ids):
+        # position of each ID in the sorted index, -1 for IDs the snapshot does not hold
+        query = np.array(list(ids), dtype=str)
+        if not len(self.ids) or not len(query):
+            return np.full(len(query), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.ids, query), len(self.ids) - 1)
+        return np.where(self.ids[positions] == query, positions, -1)
+
+    def _line(self, position):
+        if self._map is None:
+            with open(self.file, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start = self.offsets[position]
+        return self._map[start:start + self.lengths[position]]
+
+    def _lines(self, ids):
+        # (ID, line) for the given IDs the snapshot holds, in file order
+        ids = list(ids)
+        positions = self.locate(ids)
+        found = np.flatnonzero(positions >= 0)
+        for pos in found[np.argsort(self.offsets[positions[found]], kind='stable')]:
+            yield ids[pos], self._line(positions[pos])
+
+    def get(self, idx: str):
+        # record of one ID, None when the snapshot does not hold it
+        position = self.locate([idx])[0]
+        return ndjson_io.loads(self._line(position)) if position >= 0 else None
+
+    def records(self, ids):
+        # ID -> record for the given IDs the snapshot holds, read in file order
+        return {idx: ndjson_io.loads(line) for idx, line in self._lines(ids)}
+
+    def fields(self, ids, fields):
+        # ID -> tuple of the (dotted) fields for the given IDs the snapshot holds, parsing only those fields
+        reader = ndjson_io.FieldReader([snapshots.field_path(field) for field in fields])
+        return {idx: reader(line) for idx, line in self._lines(ids)}
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def latest_fields(files, ids, fields, complete: bool=False):
+    # ID -> tuple of the (dotted) fields from the newest snapshot holding that ID, over files in date order (e.g.
+    # snapshots.discover(...).values()), like reading every file in turn into a dict but parsing one record per ID;
+    # complete=True skips records missing any field and falls back to older snapshots; IDs are returned in the order
+    # they first appear across the files
+    files = list(files)
+    wanted = list(dict.fromkeys(ids))
+    if any(ndjson_io.resolve(file).endswith(ndjson_io.COMPRESSED_EXTS) for file in files):
+        return _scan_latest_fields(files, wanted, fields, complete)
+
+    indexes = [OffsetIndex(file) for file in files]
+
+    found = {}
+    for index in reversed(indexes):
+        missing = [idx for idx in wanted if idx not in found]
+        if not missing:
+            break
+        for idx, values in index.fields(missing, fields).items():
+            if not complete or None not in values:
+                found[idx] = values
+
+    # first-appearance order: oldest snapshot first, then file order within it
+    ordered = {}
+    for index in indexes:
+        remaining = [idx for idx in wanted if idx in found and idx not in ordered]
+        if not len(index) or not remaining:
+            continue
+        positions = index.locate(remaining)
+        for pos in np.argsort(np.where(positions >= 0, index.offsets[positions], -1), kind='stable'):
+            if positions[pos] >= 0:
+                ordered[remaining[pos]] = found[remaining[pos]]
+
+    for index in indexes:
+        index.close()
+    return ordered
+
+
+def _scan_latest_fields(files, wanted, fields, complete: bool):
+    # latest_fields over snapshots that cannot be indexed (compressed): every file is read in full
+    columns = [snapshots.read_fields(file, ['id'] + list(fields)) for file in files]
+    wanted = set(wanted)
+
+    first_seen = {}
+    latest = {}
+    for column in columns:
+        for idx, *values in zip(*column.values()):
+            if idx not in wanted:
+                continue
+            first_seen.setdefault(idx, len(first_seen))
+            if not complete or None not in values:
+                latest[idx] = tuple(values)
+
+    return {idx: latest[idx] for idx in sorted(latest, key=first_seen.get)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build byte-offset sidecar indexes of NDJSON snapshots")
+    parser.add_argument('--data', default=path, help="directory holding one subdirectory per topic")
+    parser.add_argument('--topics', nargs='*', help="topics to index (default: every topic directory)")
+    parser.add_argument('--kinds', nargs='*', default=['details', 'channels'], help="snapshot file kinds to index")
+    parser.add_argument('--index-dir', help="directory for the sidecar files (default: next to each snapshot)")
+    args = parser.parse_args()
+    index_dir = args.index_dir
+
+    topics = args.topics or [topic for topic in sorted(os.listdir(args.data)) if os.path.isdir(os.path.join(args.data, topic))]
+    built = 0
+    for topic in topics:
+        for kind in args.kinds:
+            for file in snapshots.discover(os.path.join(args.data, topic), kind).values():
+                if file.endswith(ndjson_io.COMPRESSED_EXTS):
+                    print(f"Skipping {file}: compressed")
+                    continue
+                print(f"Indexing {file}")
+                build_index(file, snapshots.ID_FIELDS.get(kind, 'id'))
+                built += 1
+    print(f"{built} files indexed")
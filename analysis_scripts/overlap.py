@@ -0,0 +1,65 @@
+import numpy as np
+from presence import PresenceMatrix, popcount
+
+
+# IDs unpacked per block when counting pairwise intersections; float32 sums stay exact below 2**24 per block
+block_bytes = 1 << 17
+
+
+def pairwise_intersections(bits):
+    # |S_i & S_j| for every pair of packed presence rows, as one matrix product per block of IDs
+    n_rows = bits.shape[0]
+    counts = np.zeros((n_rows, n_rows), dtype=np.int64)
+    for start in range(0, bits.shape[1], block_bytes):
+        dense = np.unpackbits(bits[:, start:start + block_bytes], axis=1).astype(np.float32)
+        counts += np.rint(dense @ dense.T).astype(np.int64)
+    return counts
+
+
+def pack_arrays(arrays, n_ids: int=None):
+    # packed presence rows from arrays of integer IDs (e.g. IdIndex codes)
+    if n_ids is None:
+        n_ids = max((int(array.max()) + 1 for array in arrays if len(array)), default=0)
+
+    bits = np.zeros((len(arrays), (n_ids + 7) // 8), dtype=np.uint8)
+    for row, array in enumerate(arrays):
+        present = np.zeros(n_ids, dtype=bool)
+        present[array] = True
+        bits[row] = np.packbits(present)
+    return bits
+
+
+class SnapshotOverlap:
+    # all-pairs overlap between snapshots, indexed [i, j] in date order:
+    #   intersection  |S_i & S_j|          union       |S_i | S_j|
+    #   jaccard       intersection/union   difference  |S_i - S_j| (directed)
+    #   difference_ratio  |S_i - S_j| / |S_i | S_j|, the set-difference shares the consistency figures use
+    # pairs of empty snapshots have an undefined (nan) jaccard and difference_ratio
+    def __init__(self, bits, dates):
+        self.dates = list(dates)
+        self.sizes = popcount(bits, axis=1)
+        self.intersection = pairwise_intersections(bits)
+        self.union = self.sizes[:, None] + self.sizes[None, :] - self.intersection
+        self.difference = self.sizes[:, None] - self.intersection
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.jaccard = np.where(self.union > 0, self.intersection / self.union, np.nan)
+            self.difference_ratio = np.where(self.union > 0, self.difference / self.union, np.nan)
+
+    @classmethod
+    def from_presence(cls, presence: PresenceMatrix):
+        return cls(presence.bits, presence.dates)
+
+    @classmethod
+    def from_sets(cls, id_sets):
+        # id_sets: date -> set of IDs, e.g. snapshots.load_ids
+        return cls.from_presence(PresenceMatrix.from_sets(id_sets))
+
+    @classmethod
+    def from_arrays(cls, arrays, n_ids: int=None):
+        # arrays: date -> array of integer IDs
+        return cls(pack_arrays(list(arrays.values()), n_ids), arrays.keys())
+
+    def previous(self):
+        # index of each snapshot's predecessor (the first snapshot is its own)
+        return np.maximum(np.arange(len(self.dates)) - 1, 0)
@@ -0,0 +1,120 @@
+import numpy as np
+
+
+# set bits per byte value; works on any numpy version (np.bitwise_count needs numpy >= 2)
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def popcount(bits, axis=-1):
+    # number of set bits along axis of a packed uint8 array
+    return POPCOUNT[bits].sum(axis=axis, dtype=np.int64)
+
+
+class IdIndex:
+    # interns string IDs (video, channel or comment IDs) as dense integers 0..n-1, in first-seen order
+    def __init__(self, ids=()):
+        self.ids = []
+        self.codes = {}
+        self.encode(ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, idx):
+        return idx in self.codes
+
+    def encode(self, ids, add: bool=True):
+        # integer codes of ids; unseen IDs are interned, or coded -1 with add=False
+        ids = ids if isinstance(ids, list) else list(ids)
+        codes = np.empty(len(ids), dtype=np.int64)
+
+        for pos, idx in enumerate(ids):
+            code = self.codes.get(idx)
+            if code is None:
+                if not add:
+                    codes[pos] = -1
+                    continue
+                code = len(self.ids)
+                self.codes[idx] = code
+                self.ids.append(idx)
+            codes[pos] = code
+
+        return codes
+
+    def decode(self, codes):
+        return [self.ids[code] for code in codes]
+
+    def save(self, path: str):
+        np.save(path, np.array(self.ids, dtype=str))
+
+    @classmethod
+    def load(cls, path: str):
+        return cls(np.load(path).tolist())
+
+
+class PresenceMatrix:
+    # which interned IDs are present in which snapshot, bit-packed: one row per snapshot (in date order) holding
+    # ceil(n_ids/8) bytes, bit i of a row set when ID i is in that snapshot; set algebra between snapshots is then a
+    # bitwise operation on two rows, and per-ID presence sequences come from unpacking
+    def __init__(self, bits, dates, index: IdIndex):
+        self.bits = bits
+        self.dates = list(dates)
+        self.index = index
+        self.n_ids = len(index)
+
+    @classmethod
+    def from_sets(cls, id_sets, index: IdIndex=None):
+        # id_sets: date -> iterable of IDs (e.g. snapshots.load_ids); dates are taken in the order given
+        index = index if index is not None else IdIndex()
+        dates = list(id_sets)
+        codes = [index.encode(id_sets[date]) for date in dates]
+
+        # packed row by row, so the unpacked matrix is never held in memory at once
+        bits = np.zeros((len(dates), (len(index) + 7) // 8), dtype=np.uint8)
+        for row, row_codes in enumerate(codes):
+            present = np.zeros(len(index), dtype=bool)
+            present[row_codes] = True
+            bits[row] = np.packbits(present)
+
+        return cls(bits, dates, index)
+
+    def row(self, date):
+        return self.bits[self.dates.index(date)]
+
+    def to_dense(self, dtype=np.uint8):
+        # IDs x snapshots array of 0/1, rows in ID code order and columns in date order
+        return np.unpackbits(self.bits, axis=1, count=self.n_ids).T.astype(dtype, copy=False)
+
+    def contains(self, idx: str, date):
+        code = self.index.codes.get(idx)
+        if code is None:
+            return False
+        return bool(self.row(date)[code >> 3] & (0x80 >> (code & 7)))
+
+    def presence(self, idx: str):
+        # presence of one ID in every snapshot, in date order
+        code = self.index.codes.get(idx)
+        if code is None:
+            return np.zeros(len(self.dates), dtype=bool)
+        return (self.bits[:, code >> 3] & (0x80 >> (code & 7))) > 0
+
+    def counts(self):
+        # number of IDs present in each snapshot
+        return popcount(self.bits, axis=1)
+
+    def members(self, bits):
+        # IDs whose bits are set in a packed row, e.g. row(d1) & ~row(d2)
+        codes = np.flatnonzero(np.unpackbits(bits, count=self.n_ids))
+        return self.index.decode(codes)
+
+    def save(self, path: str):
+        np.savez_compressed(path, bits=self.bits, dates=np.array([str(date) for date in self.dates]), ids=np.array(self.index.ids, dtype=str))
+
+    @classmethod
+    def load(cls, path: str, parse_date=None):
+        # dates are stored as strings; pass parse_date (e.g. datetime.fromisoformat) to get them back as dates
+        stored = np.load(path)
+        dates = stored['dates'].tolist()
+        if parse_date:
+            dates = [parse_date(date) for date in dates]
+        return cls(stored['bits'], dates, IdIndex(stored['ids'].tolist()))
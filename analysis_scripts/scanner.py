@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+from collections import defaultdict
+from tqdm import tqdm
+import ndjson_io
+
+
+# parallel NDJSON scan: a plain file is split into byte ranges, each worker parses the lines starting inside its
+# ranges and keeps what a per-record projection emits, and the per-range ID sets are merged; progress is counted
+# in bytes, so no separate pass is needed to size it
+
+chunk_bytes = 1 << 24  # bytes per range handed to a worker
+
+_project = None  # projection of the running scan, inherited by the forked workers
+
+
+def byte_ranges(size: int, chunk: int=None):
+    # (start, end) ranges covering size bytes
+    chunk = chunk or chunk_bytes
+    return [(start, min(start + chunk, size)) for start in range(0, size, chunk)]
+
+
+def _parser(fields):
+    # line -> record, or with fields (dotted) the tuple of just those values (ndjson_io.FieldReader)
+    if fields:
+        return ndjson_io.FieldReader([field.split('.') for field in fields])
+    return ndjson_io.loads
+
+
+def read_range(path: str, start: int, end: int, fields=None):
+    # records of the lines that start in [start, end): a line crossing start belongs to the range before
+    parse = _parser(fields)
+    with open(path, 'rb') as f:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()  # rest of the line holding byte start-1; just its newline when a line starts at start
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                yield parse(line)
+
+
+def _merge(sets, found):
+    for name, values in found.items():
+        sets[name] |= values
+
+
+def _scan_range(path: str, start: int, end: int, fields=None, project=None):
+    project = project or _project
+    found = defaultdict(set)
+    for raw in read_range(path, start, end, fields):
+        for name, value in project(raw):
+            found[name].add(value)
+    return dict(found), end - start
+
+
+def _scan_task(task):
+    return _scan_range(*task)
+
+
+def scan(path: str, project, workers: int=None, desc: str=None, fields=None):
+    # project(raw) -> iterable of (name, value) pairs, e.g. ('toplevel', raw['id']) for records passing a filter;
+    # returns name -> set of every value emitted under that name (a defaultdict, so names never emitted are empty);
+    # given fields (dotted, '*' mapping over lists), project gets the tuple of only those values instead of the record
+    global _project
+    path = ndjson_io.resolve(path)
+    sets = defaultdict(set)
+
+    # compressed files cannot be entered mid-stream, so they are read in this process, counting decompressed bytes
+    if path.endswith(ndjson_io.COMPRESSED_EXTS):
+        parse = _parser(fields)
+        with tqdm(desc=desc, unit='B', unit_scale=True) as pbar, ndjson_io.open_ndjson(path, binary=True) as f:
+            for line in f:
+                if line.strip():
+                    for name, value in project(parse(line)):
+                        sets[name].add(value)
+                pbar.update(len(line))
+        return sets
+
+    size = os.path.getsize(path)
+    ranges = byte_ranges(size)
+
+    # workers are forked (as in markov.bootstrap_ci) so the projection, and whatever script state it reads, needs
+    # no pickling; without fork, or with a single range, the ranges are read in this process
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        workers = 1
+
+    with tqdm(total=size, desc=desc, unit='B', unit_scale=True) as pbar:
+        if workers <= 1:
+            for start, end in ranges:
+                found, n_bytes = _scan_range(path, start, end, fields, project)
+                _merge(sets, found)
+                pbar.update(n_bytes)
+        else:
+            _project = project
+            try:
+                with multiprocessing.get_context('fork').Pool(workers) as pool:
+                    for found, n_bytes in pool.imap_unordered(_scan_task, [(path, start, end, fields) for start, end in ranges]):
+                        _merge(sets, found)
+                        pbar.update(n_bytes)
+            finally:
+                _project = None
+
+    return sets
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from datetime import datetime
+import ndjson_io
+
+
+# shared snapshot loader: finds a topic's <date>_<kind>.ndjson files, parses their dates and reads the requested
+# fields once; results are memoized in process and on disk, keyed by file size and mtime, so running every analysis
+# parses each file a single time until it changes
+
+year = 2025  # year of the latest snapshots with year-less names (%b_%d), i.e. when the collection ran
+cache_dir = "./cache/snapshots/"  # on-disk memo; set to None to keep results in process only
+
+DATE_FORMATS = ("%Y-%m-%d", "%Y_%b_%d", "%b_%d_%Y", "%b_%d")
+
+# where a record's own ID lives, per snapshot kind
+ID_FIELDS = {'videos': 'id.videoId', 'metadata': 'etag'}
+
+_memo = {}
+
+
+def _parse(name: str, default_year: int=year):
+    # (date, whether the name carried its own year)
+    for fmt in DATE_FORMATS:
+        try:
+            date = datetime.strptime(name, fmt)
+        except ValueError:
+            continue
+        if '%Y' in fmt:
+            return date, True
+        return date.replace(year=default_year), False
+
+    raise ValueError(f"Unrecognised snapshot date '{name}', expected one of {DATE_FORMATS}")
+
+
+def parse_date(name: str, default_year: int=year):
+    # date of a snapshot name such as apr_10 or 2025-04-10; names without a year get default_year
+    return _parse(name, default_year)[0]
+
+
+def discover(topicpath: str, kind: str='videos'):
+    # date -> file of every <date>_<kind>.ndjson[.gz|.zst] snapshot in topicpath, in date order
+    suffix = f"_{kind}.ndjson"
+    files = {}
+    yearless = []
+
+    for file in os.listdir(topicpath):
+        name = ndjson_io.plain_name(file)
+        if not name.endswith(suffix):
+            continue
+
+        # removesuffix, not strip: strip removes characters, so it also eats the start of jan_, nov_, dec_, ...
+        date, has_year = _parse(name.removesuffix(suffix))
+        files[date] = os.path.join(topicpath, file)
+        if not has_year:
+            yearless.append(date)
+
+    # year-less collections that cross new year (e.g. dec -> jan): the months before the gap belong to the year before
+    if yearless and max(date.month for date in yearless) - min(date.month for date in yearless) > 6:
+        for date in yearless:
+            if date.month > 6:
+                files[date.replace(year=date.year - 1)] = files.pop(date)
+
+    return OrderedDict(sorted(files.items()))
+
+
+def field_path(field: str):
+    # dotted field name -> key path, e.g. 'snippet.publishedAt' -> ('snippet', 'publishedAt')
+    return tuple(field.split('.'))
+
+
+def _cache_key(file: str, fields):
+    stat = os.stat(file)
+    return (os.path.realpath(file), stat.st_size, stat.st_mtime_ns, tuple(fields))
+
+
+def fingerprint(files):
+    # digest of the files' paths, sizes and mtimes, for caching results derived from several snapshots
+    return hashlib.sha1(repr([_cache_key(file, ()) for file in files]).encode()).hexdigest()
+
+
+def _cache_file(key):
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()
+    return os.path.join(cache_dir, f"{digest}.pickle")
+
+
+def read_fields(file: str, fields):
+    # column per requested (dotted) field over every record of one file; missing keys give None
+    fields = list(fields)
+    key = _cache_key(file, fields)
+    if key in _memo:
+        return _memo[key]
+
+    if cache_dir and os.path.exists(_cache_file(key)):
+        with open(_cache_file(key), 'rb') as f:
+            columns = pickle.load(f)
+        _memo[key] = columns
+        return columns
+
+    reader = ndjson_io.FieldReader([field_path(field) for field in fields])
+    columns = {field: [] for field in fields}
+    appends = [column.append for column in columns.values()]
+
+    with ndjson_io.open_ndjson(file, binary=True) as f:
+        for line in f:
+            for append, value in zip(appends, reader(line)):
+                append(value)
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = _cache_file(key) + '.tmp'
+        with open(tmp_file, 'wb') as fw:
+            pickle.dump(columns, fw, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, _cache_file(key))
+
+    _memo[key] = columns
+    return columns
+
+
+def load_fields(topicpath: str, kind: str, fields):
+    # date -> {field: column} for every snapshot of one kind, in date order
+    return OrderedDict((date, read_fields(file, fields)) for date, file in discover(topicpath, kind).items())
+
+
+def load_ids(topicpath: str, kind: str='videos'):
+    # date -> set of record IDs for every snapshot of one kind, in date order
+    id_field = ID_FIELDS.get(kind, 'id')
+    return OrderedDict((date, set(columns[id_field])) for date, columns in load_fields(topicpath, kind, [id_field]).items())
@@ -0,0 +1,256 @@
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+
+# synthetic snapshot trees shaped like the collected ones: <out>/<topic>/<date>_<kind>.ndjson for kinds videos (search
+# results), details (video resources), channels, metadata (one search response per hourly query window), and threads /
+# comments for the first and last snapshot, plus a queries.json with the topics' focal dates; sizes, churn between
+# snapshots and comment volume are configurable, so analyses can be timed on trees far larger than the real one
+
+path = "./synthetic/"
+queries_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../collection_scripts/queries.json")  # focal dates of the real topics
+
+onetailed_span = 14  # days either side of the focal date that the search windows cover
+embedded_replies = 5  # replies a commentThreads item carries; the rest only come from comments.list
+
+WORDS = ("video news live update official full clip reaction analysis interview protest vote final world cup music award "
+         "science report today breaking highlights speech debate review explained history street crowd police city").split()
+
+
+def make_id(*parts, length: int=11):
+    # stable pseudo-random YouTube-style ID (URL-safe base64) for the given parts
+    digest = hashlib.blake2b(':'.join(map(str, parts)).encode(), digest_size=(length * 3 + 3) // 4).digest()
+    return base64.urlsafe_b64encode(digest).decode()[:length]
+
+
+def timestamp(date: datetime):
+    return date.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def snapshot_names(n_snapshots: int, start: datetime, interval: int):
+    # <date> names as the collection writes them (e.g. feb_09); spans over half a year carry their year (2025-02-09)
+    dates = [start + timedelta(days=interval * pos) for pos in range(n_snapshots)]
+    with_year = interval * n_snapshots > 180
+    return [date.strftime('%Y-%m-%d') if with_year else date.strftime('%b_%d').lower() for date in dates]
+
+
+def thumbnails(key: str, sizes=(('default', 120, 90), ('medium', 320, 180), ('high', 480, 360))):
+    return {size: {'url': f"https://i.ytimg.com/vi/{key}/{size}.jpg", 'width': width, 'height': height} for size, width, height in sizes}
+
+
+class TopicGenerator:
+    # one topic's videos, channels and comments, drawn once and then written per snapshot
+    def __init__(self, topic: str, query: str, focal_date: datetime, videos: int, churn: float, comments: float, seed: int):
+        self.topic = topic
+        self.query = query
+        self.focal_date = focal_date
+        self.rng = random.Random(f"{seed}:{topic}")
+        self.texts = [' '.join(self.rng.choices(WORDS, k=self.rng.randint(20, 250))) for _ in range(200)]
+        self.comments = comments
+        self.seed = seed
+
+        self.videos = []
+        self.channels = []
+
+        # video positions per snapshot: each snapshot drops a churn share of the previous one and refills it with
+        # new videos and, for a third, with earlier dropouts resurfacing
+        self.churn = churn
+        self.current = [self._new_video() for _ in range(videos)]
+        self.dropped = []
+        self.presence = [list(self.current)]
+
+    def _new_video(self):
+        rng = self.rng
+        # a few channels upload most of the videos
+        if not self.channels or rng.random() < 0.4:
+            self.channels.append({'id': 'UC' + make_id(self.topic, 'channel', len(self.channels), length=22),
+                                  'published': self.focal_date - timedelta(days=rng.uniform(30, 5000)),
+                                  'title': ' '.join(rng.choices(WORDS, k=2)).title(),
+                                  'views': int(rng.paretovariate(1.2) * 1000), 'subs': int(rng.paretovariate(1.3) * 100),
+                                  'numvids': rng.randint(1, 2000), 'hidden': rng.random() < 0.05})
+        channel = rng.randrange(len(self.channels))
+        published = self.focal_date + timedelta(seconds=rng.uniform(-onetailed_span, onetailed_span) * 86400)
+        self.videos.append({'id': make_id(self.topic, 'video', len(self.videos)), 'channel': channel,
+                            'published': published.replace(microsecond=0), 'title': ' '.join(rng.choices(WORDS, k=rng.randint(3, 10))),
+                            'text': rng.randrange(len(self.texts)), 'duration': rng.randint(5, 7200),
+                            'definition': 'hd' if rng.random() < 0.6 else 'sd', 'views': int(rng.paretovariate(1.1) * 20),
+                            'hide_likes': rng.random() < 0.03})
+        return len(self.videos) - 1
+
+    def snapshot(self, pos: int):
+        # video positions in snapshot pos, drawing the snapshots up to it
+        rng = self.rng
+        while len(self.presence) <= pos:
+            n_out = int(round(self.churn * len(self.current)))
+            leaving = set(rng.sample(range(len(self.current)), n_out))
+            self.dropped.extend(self.current[idx] for idx in leaving)
+            self.current = [video for idx, video in enumerate(self.current) if idx not in leaving]
+            for _ in range(n_out):
+                if self.dropped and rng.random() < 1 / 3:
+                    self.current.append(self.dropped.pop(rng.randrange(len(self.dropped))))
+                else:
+                    self.current.append(self._new_video())
+            rng.shuffle(self.current)
+            self.presence.append(list(self.current))
+        return self.presence[pos]
+
+    def search_result(self, video):
+        channel = self.channels[video['channel']]
+        return {'kind': 'youtube#searchResult', 'etag': make_id(self.topic, 'etag', video['id'], length=27),
+                'id': {'kind': 'youtube#video', 'videoId': video['id']},
+                'snippet': {'publishedAt': timestamp(video['published']), 'channelId': channel['id'], 'title': video['title'],
+                            'description': self.texts[video['text']][:160], 'thumbnails': thumbnails(video['id']),
+                            'channelTitle': channel['title'], 'liveBroadcastContent': 'none', 'publishTime': timestamp(video['published'])}}
+
+    def video_resource(self, video, pos: int):
+        channel = self.channels[video['channel']]
+        views = int(video['views'] * (1 + 0.05 * pos))
+        statistics = {'viewCount': str(views), 'likeCount': str(views // 30), 'favoriteCount': '0', 'commentCount': str(views // 200)}
+        if video['hide_likes']:
+            del statistics['likeCount']
+        minutes, seconds = divmod(video['duration'], 60)
+        return {'kind': 'youtube#video', 'etag': make_id(self.topic, 'etag', video['id'], pos, length=27), 'id': video['id'],
+                'snippet': {'publishedAt': timestamp(video['published']), 'channelId': channel['id'], 'title': video['title'],
+                            'description': self.texts[video['text']], 'thumbnails': thumbnails(video['id']),
+                            'channelTitle': channel['title'], 'categoryId': '25', 'liveBroadcastContent': 'none',
+                            'localized': {'title': video['title'], 'description': self.texts[video['text']]}},
+                'contentDetails': {'duration': f"PT{minutes}M{seconds}S", 'dimension': '2d', 'definition': video['definition'],
+                                   'caption': 'false', 'licensedContent': False, 'contentRating': {}, 'projection': 'rectangular'},
+                'statistics': statistics}
+
+    def channel_resource(self, channel, pos: int):
+        statistics = {'viewCount': str(int(channel['views'] * (1 + 0.02 * pos))), 'subscriberCount': str(channel['subs']),
+                      'hiddenSubscriberCount': channel['hidden'], 'videoCount': str(channel['numvids'] + pos)}
+        if channel['hidden']:
+            del statistics['subscriberCount']
+        return {'kind': 'youtube#channel', 'etag': make_id(self.topic, 'etag', channel['id'], pos, length=27), 'id': channel['id'],
+                'snippet': {'title': channel['title'], 'description': self.texts[0][:300], 'customUrl': '@' + channel['title'].replace(' ', '').lower(),
+                            'publishedAt': timestamp(channel['published']), 'thumbnails': thumbnails(channel['id']),
+                            'localized': {'title': channel['title'], 'description': self.texts[0][:300]}, 'country': 'US'},
+                'contentDetails': {'relatedPlaylists': {'likes': '', 'uploads': 'UU' + channel['id'][2:]}},
+                'statistics': statistics}
+
+    def search_responses(self, videos, collected: datetime):
+        # one response per hourly window, with the window's result count
+        start = self.focal_date - timedelta(days=onetailed_span)
+        per_hour = {}
+        for video in videos:
+            hour = int((video['published'] - start).total_seconds() // 3600)
+            per_hour[hour] = per_hour.get(hour, 0) + 1
+
+        for hour in range(onetailed_span * 2 * 24):
+            window = start + timedelta(hours=hour)
+            count = per_hour.get(hour, 0)
+            yield {'kind': 'youtube#searchListResponse', 'etag': make_id(self.topic, 'response', collected, hour, length=27), 'regionCode': 'US',
+                   'pageInfo': {'totalResults': count * 3 + self.rng.randint(0, 5), 'resultsPerPage': min(count, 50)},
+                   'query_time': timestamp(collected + timedelta(seconds=hour * 5)),
+                   'query': {'part': 'snippet', 'maxResults': 50, 'order': 'date', 'safeSearch': 'none',
+                             'publishedAfter': timestamp(window), 'publishedBefore': timestamp(window + timedelta(hours=1)),
+                             'type': 'video', 'q': self.query}}
+
+    def comment(self, comment_id: str, video, published: datetime, parent: str=None):
+        text = self.texts[sum(map(ord, comment_id)) % len(self.texts)][:200]
+        snippet = {'channelId': self.channels[video['channel']]['id'], 'videoId': video['id'], 'textDisplay': text, 'textOriginal': text,
+                   'authorDisplayName': '@' + make_id(comment_id, 'author', length=8),
+                   'canRate': True, 'viewerRating': 'none', 'likeCount': 0,
+                   'publishedAt': timestamp(published), 'updatedAt': timestamp(published)}
+        if parent:
+            snippet['parentId'] = parent
+        return {'kind': 'youtube#comment', 'etag': make_id(comment_id, 'etag', length=27), 'id': comment_id, 'snippet': snippet}
+
+    def threads(self, video, pos: int):
+        # (thread, replies only reachable through comments.list) per comment thread of a video still online at pos;
+        # a video's threads are the same in every snapshot, and each is visible with probability 0.9
+        rng = random.Random(f"{self.seed}:{self.topic}:{video['id']}")
+        seen = random.Random(f"{self.seed}:{self.topic}:{video['id']}:{pos}")
+        for number in range(int(rng.expovariate(1 / self.comments)) if self.comments > 0 else 0):
+            thread_id = 'Ug' + make_id(video['id'], 'thread', number, length=24)
+            published = video['published'] + timedelta(hours=rng.uniform(0, 40 * 24))
+            n_replies = int(rng.expovariate(1 / 2)) if rng.random() < 0.3 else 0
+            replies = [self.comment(f"{thread_id}.{make_id(thread_id, reply, length=22)}", video, published + timedelta(hours=rng.uniform(0, 72)), thread_id)
+                       for reply in range(n_replies)]
+            if seen.random() >= 0.9:
+                continue
+
+            thread = {'kind': 'youtube#commentThread', 'etag': make_id(thread_id, 'etag', length=27), 'id': thread_id,
+                      'snippet': {'channelId': self.channels[video['channel']]['id'], 'videoId': video['id'],
+                                  'topLevelComment': self.comment(thread_id, video, published),
+                                  'canReply': True, 'totalReplyCount': n_replies, 'isPublic': True}}
+            if replies:
+                thread['replies'] = {'comments': replies[:embedded_replies]}
+            yield thread, replies if n_replies > embedded_replies else []
+
+
+def write_records(file: str, records):
+    with open(file, 'w') as fw:
+        for record in records:
+            fw.write(json.dumps(record) + '\n')
+
+
+def generate_topic(out: str, generator: TopicGenerator, names, details_coverage: float=0.93):
+    topicpath = os.path.join(out, generator.topic)
+    os.makedirs(topicpath, exist_ok=True)
+    collected = datetime(2025, 1, 1)
+
+    for pos, name in enumerate(names):
+        videos = [generator.videos[idx] for idx in generator.snapshot(pos)]
+        detailed = [video for video in videos if generator.rng.random() < details_coverage]
+        channels = list(dict.fromkeys(video['channel'] for video in detailed))
+
+        write_records(os.path.join(topicpath, f"{name}_videos.ndjson"), (generator.search_result(video) for video in videos))
+        write_records(os.path.join(topicpath, f"{name}_details.ndjson"), (generator.video_resource(video, pos) for video in detailed))
+        write_records(os.path.join(topicpath, f"{name}_channels.ndjson"), (generator.channel_resource(generator.channels[idx], pos) for idx in channels))
+        write_records(os.path.join(topicpath, f"{name}_metadata.ndjson"), generator.search_responses(videos, collected + timedelta(days=pos)))
+
+        if pos in (0, len(names) - 1):
+            with open(os.path.join(topicpath, f"{name}_threads.ndjson"), 'w') as ft, open(os.path.join(topicpath, f"{name}_comments.ndjson"), 'w') as fc:
+                for video in videos:
+                    for thread, replies in generator.threads(video, pos):
+                        ft.write(json.dumps(thread) + '\n')
+                        for reply in replies:
+                            fc.write(json.dumps(reply) + '\n')
+
+
+def generate(out: str=path, topics=None, snapshots: int=16, videos: int=750, churn: float=0.1, comments: float=5.0,
+             interval: int=5, start: str='2025-02-09', seed: int=0):
+    # write the synthetic tree and its queries.json; returns the settings used, e.g. for benchmark reports
+    with open(queries_file, 'r') as f:
+        known = json.load(f)
+    topics = topics or list(known)
+
+    queries = {topic: known.get(topic, {'q': topic, 'focal_date': '2020-01-01T00:00:00Z'}) for topic in topics}
+    names = snapshot_names(snapshots, datetime.fromisoformat(start), interval)
+
+    os.makedirs(out, exist_ok=True)
+    for topic in topics:
+        print(f"Generating {topic}")
+        focal_date = datetime.fromisoformat(queries[topic]['focal_date'].replace('Z', '+00:00')).replace(tzinfo=None)
+        generate_topic(out, TopicGenerator(topic, queries[topic]['q'], focal_date, videos, churn, comments, seed), names)
+
+    with open(os.path.join(out, 'queries.json'), 'w') as fw:
+        json.dump(queries, fw, indent=4)
+
+    return {'topics': topics, 'snapshots': snapshots, 'videos': videos, 'churn': churn, 'comments': comments,
+            'interval': interval, 'start': start, 'seed': seed}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic snapshot tree shaped like the collected data")
+    parser.add_argument('--out', default=path, help="output directory, one subdirectory per topic")
+    parser.add_argument('--topics', nargs='*', help="topic names (default: the topics of queries.json)")
+    parser.add_argument('--snapshots', type=int, default=16, help="snapshots per topic")
+    parser.add_argument('--videos', type=int, default=750, help="videos per snapshot")
+    parser.add_argument('--scale', type=float, default=1, help="multiplier on videos per snapshot")
+    parser.add_argument('--churn', type=float, default=0.1, help="share of a snapshot's videos replaced in the next one")
+    parser.add_argument('--comments', type=float, default=5.0, help="mean comment threads per video")
+    parser.add_argument('--interval', type=int, default=5, help="days between snapshots")
+    parser.add_argument('--start', default='2025-02-09', help="date of the first snapshot")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.out, args.topics, args.snapshots, int(args.videos * args.scale), args.churn, args.comments, args.interval, args.start, args.seed)
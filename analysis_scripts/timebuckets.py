@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from presence import IdIndex
+
+
+# fixed-width publication-time buckets over [start, end]: bucket i covers [start + i*width, start + (i+1)*width),
+# and the last bucket is the one holding `end`; timestamps become integer bucket indices, so per-bucket counts
+# and per-bucket overlap between snapshots are bincounts over integer keys instead of per-cell Python sets
+
+
+def to_epoch(timestamps):
+    # API timestamps ("2020-05-25T13:45:00Z", always UTC) as integer epoch seconds
+    return np.array(timestamps, dtype='U19').astype('datetime64[s]').astype(np.int64)
+
+
+class TimeBuckets:
+    # snapshots: date -> (IDs, publishedAt timestamps), e.g. from snapshots.load_fields; videos published outside
+    # [start, end] are left out, and an ID is counted once per bucket and snapshot
+    def __init__(self, snapshots, start, end, width):
+        self.dates = list(snapshots)
+        self.start = int(start.timestamp())
+        self.width = int(width.total_seconds())
+        self.n_buckets = (int(end.timestamp()) - self.start) // self.width + 1
+
+        self.index = IdIndex()
+        self.keys = []  # per snapshot: sorted unique bucket * 2**32 + interned ID code
+        for date in self.dates:
+            ids, published = snapshots[date]
+            buckets = (to_epoch(published) - self.start) // self.width
+            codes = self.index.encode(ids)
+            inside = (buckets >= 0) & (buckets < self.n_buckets)
+            self.keys.append(np.unique((buckets[inside] << 32) | codes[inside]))
+
+        self.counts = np.stack([self._per_bucket(keys) for keys in self.keys], axis=1) if self.keys else np.zeros((self.n_buckets, 0), dtype=np.int64)
+
+    def _per_bucket(self, keys):
+        return np.bincount(keys >> 32, minlength=self.n_buckets)
+
+    def edges(self):
+        # bucket start times (UTC)
+        return pd.to_datetime(self.start + self.width * np.arange(self.n_buckets), unit='s', utc=True)
+
+    def intersection(self, first: int, second: int):
+        # per-bucket number of IDs in both snapshots (by position in date order; negative positions count from the end)
+        return self._per_bucket(np.intersect1d(self.keys[first], self.keys[second], assume_unique=True))
+
+    def jaccard(self, first: int, second: int):
+        # per-bucket Jaccard similarity between two snapshots; buckets empty in both count as identical (1.0)
+        inter = self.intersection(first, second)
+        union = self.counts[:, first] + self.counts[:, second] - inter
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(union > 0, inter / union, 1.0)
+
+    def frame(self, date_format: str="%b_%d"):
+        # buckets x snapshots counts, indexed by bucket start, one column per snapshot
+        return pd.DataFrame(self.counts, index=self.edges().rename('pubtime'), columns=[date.strftime(date_format) for date in self.dates])
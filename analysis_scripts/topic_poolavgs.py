@@ -1,8 +1,7 @@
-import json
-import os
 import numpy as np
 import pandas as pd
 from scipy import stats
+import snapshots
 
 topics = ['blm', 'brexit', 'capriot', 'grammys', 'higgs', 'worldcup']
 
@@ -17,15 +16,9 @@ for topic in topics:
     totals = []
     returns = []
 
-    for file in os.listdir(topicpath):
-        if file.endswith("_metadata.ndjson"):
-            with open(os.path.join(topicpath, file), 'r') as f:
-                for line in f:
-                    raw = json.loads(line)
-                    numres = raw['pageInfo']['totalResults']
-                    rets = raw['pageInfo']['resultsPerPage']
-                    totals.append(numres)
-                    returns.append(rets)
+    for columns in snapshots.load_fields(topicpath, 'metadata', ['pageInfo.totalResults', 'pageInfo.resultsPerPage']).values():
+        totals.extend(columns['pageInfo.totalResults'])
+        returns.extend(columns['pageInfo.resultsPerPage'])
 
     print(f"{topic}: {stats.spearmanr(totals, returns)}")
     
@@ -0,0 +1,74 @@
+import os
+import threading
+from contextlib import contextmanager
+import googleapiclient.discovery
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import build_http
+
+
+api_service_name = "youtube"
+api_version = "v3"
+
+# local copy of the discovery document, so clients are built without a discovery round-trip
+discovery_cache = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', f"{api_service_name}.{api_version}.json")
+
+_document = None
+_document_lock = threading.Lock()
+
+_clients = {}  # API key -> service, shared by every thread of the process
+_clients_lock = threading.Lock()
+_http_pool = []  # idle keep-alive connections
+_http_lock = threading.Lock()
+
+
+def discovery_document():
+    # read once per process: local cache first, then the copy bundled with googleapiclient, then the discovery endpoint
+    global _document
+
+    with _document_lock:
+        if _document is not None:
+            return _document
+
+        if os.path.exists(discovery_cache):
+            with open(discovery_cache, 'r') as f:
+                _document = f.read()
+            return _document
+
+        document = get_static_doc(api_service_name, api_version)
+        if document is None:
+            uri = googleapiclient.discovery.DISCOVERY_URI.format(api=api_service_name, apiVersion=api_version)
+            resp, content = build_http().request(uri)
+            if resp.status >= 400:
+                raise RuntimeError(f"Could not fetch discovery document ({resp.status}): {uri}")
+            document = content.decode('utf-8')
+
+        os.makedirs(os.path.dirname(discovery_cache), exist_ok=True)
+        with open(discovery_cache, 'w+') as fw:
+            fw.write(document)
+
+        _document = document
+        return _document
+
+
+@contextmanager
+def pooled_http():
+    # borrow a keep-alive connection for one request (request.execute(http=...)); httplib2 is not thread-safe, so a
+    # connection serves one call at a time, and returns to the pool for whichever worker, stage or topic calls next
+    with _http_lock:
+        http = _http_pool.pop() if _http_pool else None
+    if http is None:
+        http = build_http()
+
+    try:
+        yield http
+    finally:
+        with _http_lock:
+            _http_pool.append(http)
+
+
+def get_client(dev_key: str):
+    # one service per key and process, built from the cached discovery document; requests are sent over pooled_http
+    with _clients_lock:
+        if dev_key not in _clients:
+            _clients[dev_key] = googleapiclient.discovery.build_from_document(discovery_document(), developerKey=dev_key)
+        return _clients[dev_key]
@@ -0,0 +1,52 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ChannelCache:
+    # channels.list items shared across topics and snapshots, so channels that show up in several topics are fetched
+    # once per ttl; kept in SQLite so topic processes running at the same time can read and write it concurrently
+    # items are stored per requested part, since a lookup with fewer parts would not have all the fields
+    def __init__(self, cache_file: str, ttl: float=24*3600):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+        dirname = os.path.dirname(cache_file)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        self.db = sqlite3.connect(cache_file, timeout=60, check_same_thread=False)
+        with self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS channels (id TEXT, part TEXT, fetched REAL, item TEXT, PRIMARY KEY (id, part))")
+
+        self.hits = 0
+
+    def get(self, idx: str, part: str):
+        # cached item if it was fetched within the ttl, else None
+        with self.lock:
+            row = self.db.execute("SELECT item FROM channels WHERE id = ? AND part = ? AND fetched >= ?",
+                                  (idx, part, time.time() - self.ttl)).fetchone()
+            if row is None:
+                return None
+            self.hits += 1
+
+        return json.loads(row[0])
+
+    def store(self, items, part: str):
+        now = time.time()
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR REPLACE INTO channels (id, part, fetched, item) VALUES (?, ?, ?, ?)",
+                                [(item['id'], part, now, json.dumps(item)) for item in items])
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
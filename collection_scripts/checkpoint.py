@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+
+
+class Checkpoint:
+    # append-only journal of the finished work units of one run stage (search windows, ID batches, video/thread IDs)
+    # reopening an existing journal resumes the stage: collectors append to their outputs and skip units marked done
+    def __init__(self, journal_file: str):
+        self.journal_file = journal_file
+        self.done = set()
+        self.pages = {}  # unit -> pageToken of the next page still to collect
+        self.lock = threading.Lock()
+
+        self.resumed = os.path.exists(journal_file) and os.path.getsize(journal_file) > 0
+        if self.resumed:
+            self._load()
+
+        dirname = os.path.dirname(journal_file)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self.fw = open(journal_file, 'a')
+
+    def _load(self):
+        with open(self.journal_file, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn final line from a crash mid-write
+
+                if 'done' in record:
+                    self.done.add(record['done'])
+                    self.pages.pop(record['done'], None)
+                else:
+                    self.pages[record['unit']] = record['pageToken']
+
+    @property
+    def mode(self):
+        # file mode for the stage's outputs
+        return 'a' if self.resumed else 'w+'
+
+    def is_done(self, unit: str):
+        return unit in self.done
+
+    def page_token(self, unit: str):
+        return self.pages.get(unit)
+
+    def _write(self, record):
+        self.fw.write(json.dumps(record) + '\n')
+        self.fw.flush()
+
+    def mark_page(self, unit: str, page_token: str):
+        with self.lock:
+            self.pages[unit] = page_token
+            self._write({'unit': unit, 'pageToken': page_token})
+
+    def mark_done(self, *units):
+        with self.lock:
+            for unit in units:
+                self.done.add(unit)
+                self.pages.pop(unit, None)
+                self._write({'done': unit})
+
+    def close(self):
+        self.fw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
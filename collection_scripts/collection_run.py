@@ -1,92 +1,200 @@
 import youtube_api_calls as ytapi
+import quota
+from keypool import KeyPool
+from checkpoint import Checkpoint
+from etag_cache import EtagCache
+from channel_cache import ChannelCache
+from pipeline import IdStream, Pipeline
 import logging
 import json
 import os
 from datetime import datetime, timedelta
+from multiprocessing import Process
+from multiprocessing.managers import BaseManager
 from scheduler import schedule
 
 
-dev_key = "YOUR_API_KEY"
+dev_keys = ["YOUR_API_KEY"]  # keys are used in order; the next one takes over when a key reports quotaExceeded
 
 with open('queries.json', 'r') as f:
         queries = json.load(f)
 
+data_path = "/data"  # one subdirectory per topic
 onetailed_span = 14  # determines how many days before and after focal date to collect; total span is 2x this value
+num_workers = 8  # number of search windows, ID batches, videos or threads kept in flight at once
+adaptive = False  # if True, hourly search windows are bisected when saturated and widened when sparse (runs windows sequentially)
+requests_per_second = 10  # pace shared by all collectors and workers
+daily_quota = 10000  # quota units available per key per day; calls beyond the pool's total raise quota.QuotaExhausted
+key_state_file = './logs/key_usage.json'  # per-key spend survives same-day restarts
+parallel_topics = True  # run every topic's pipeline in its own process at the same time
+record_ext = '.ndjson'  # '.ndjson.gz' or '.ndjson.zst' (needs zstandard) to write compressed outputs
+channel_cache_file = './cache/channels.sqlite'  # channel details shared by all topics and snapshots
+channel_cache_ttl = 24*3600  # seconds a cached channel is served before it is fetched again; 0 disables reuse
+
+# run-level log; topic-level messages go to each topic's own log file (see collect_topic)
+main_log = logging.getLogger('collection_run')
+
+
+def setup_main_log():
+        # attached on first use by main or a topic process rather than at import
+        if main_log.handlers:
+                return
+        main_handler = logging.FileHandler('./logs/main.log')
+        main_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+        main_log.addHandler(main_handler)
+        main_log.setLevel(logging.INFO)
+        main_log.propagate = False
+
+
+class QuotaManager(BaseManager):
+        pass
+
+
+QuotaManager.register('KeyPool', KeyPool)
+QuotaManager.register('RateLimiter', quota.RateLimiter)
+
+
+def journal(topic, cur_date, stage):
+        # one checkpoint journal per topic, snapshot and stage; rerunning on the same day resumes from it
+        return Checkpoint(f"./logs/checkpoints/{topic}/{cur_date}_{stage}.journal")
+
+
+def collect_topic(topic, cur_date, keys):
+        # full collection pipeline for one topic and snapshot
+        path = os.path.join(data_path, topic)
+
+        if not os.path.exists(path):
+                os.mkdir(path)
+
+        main_log.info(f"{datetime.now().isoformat()} - Getting {topic.upper()}")
+
+        # each topic gets its own log file; force replaces the previous topic's handler in sequential runs
+        logfile = f"./logs/{topic}_{cur_date}.log"
+        logging.basicConfig(filename=logfile, format="%(asctime)s - %(message)s", level=logging.INFO, force=True)
+
+        print(f"Performing collections for {topic.upper()} on {cur_date}\n{15*'-'}")
+
+        q = queries[topic]["q"]
+        foc_date = datetime.fromisoformat(queries[topic]["focal_date"])
+        start_date = foc_date - timedelta(days=onetailed_span)
+        start_date = start_date.isoformat()[:19] + "Z"
+        end_date = foc_date + timedelta(days=onetailed_span)
+        end_date = end_date.isoformat()[:19] + "Z"
+
+        collect_query = {
+        "part": "snippet",
+        "maxResults": 50,
+        "order": "date",
+        "safeSearch": "none",
+        "publishedAfter": start_date,
+        "publishedBefore": end_date,
+        "type": "video",
+        "q": q
+        }
+
+        video_file = f"{cur_date}_videos{record_ext}"
+        thread_file = f"{cur_date}_threads{record_ext}"
+
+        # IDs flow between stages through in-process streams as soon as they are collected, so all stages
+        # run at once instead of each one waiting for (and re-reading) the previous stage's output file
+        detail_ids = IdStream()
+        channel_ids = IdStream()
+        thread_video_ids = IdStream()
+        thread_ids = IdStream()
+
+        def on_video(raw):
+                detail_ids.put(raw['id']['videoId'])
+                thread_video_ids.put(raw['id']['videoId'])
+                channel_ids.put(raw['snippet']['channelId'])
+
+        def on_thread(raw):
+                if raw['snippet']['totalReplyCount'] > 5:
+                        thread_ids.put(raw['id'])
+
+        def search_stage():
+                with journal(topic, cur_date, 'videos') as checkpoint:
+                        ytapi.collect_videos(query=collect_query, dev_key=keys, path=path, output_file=video_file, metadata_file=f"{cur_date}_metadata{record_ext}", increment_calls=1, suppress_quota_warning=False, logfile=logfile, workers=num_workers, checkpoint=checkpoint, adaptive=adaptive, on_item=on_video)
+
+        def details_stage():
+                dets_query = {"part": "snippet,contentDetails,statistics", "id": detail_ids, "maxResults": 50}
+                details_etags = EtagCache(f"./cache/etags/{topic}_details.json")
+                with journal(topic, cur_date, 'details') as checkpoint:
+                        ytapi.get_video_details(query=dets_query, dev_key=keys, path=path, output_file=f"{cur_date}_details{record_ext}", logfile=logfile, workers=num_workers, checkpoint=checkpoint, etag_cache=details_etags)
+                details_etags.save(done=checkpoint.done)
+
+        def channels_stage():
+                chan_query = {"part": "snippet,contentDetails,statistics", "id": channel_ids, "maxResults": 50}
+                channel_etags = EtagCache(f"./cache/etags/{topic}_channels.json")
+                with journal(topic, cur_date, 'channels') as checkpoint, ChannelCache(channel_cache_file, ttl=channel_cache_ttl) as channel_cache:
+                        ytapi.get_channel_details(query=chan_query, dev_key=keys, path=path, output_file=f"{cur_date}_channels{record_ext}", logfile=logfile, workers=num_workers, checkpoint=checkpoint, etag_cache=channel_etags, channel_cache=channel_cache)
+                channel_etags.save(done=checkpoint.done)
 
-@schedule(max_iters=5, wait_time=5, time_unit="days")
-"""
-schedule params:
-
-max_iters: int, specifies how many times to run the collection
-wait_time: int, specifies how many time_unit to wait before the next collection
-time_unit: str, see scheduler.py for acceptable args
-"""
-def main():
-        for topic in queries:
-                path = f"/data/{topic}"
-
-                if not os.path.exists(path):
-                        os.mkdir(path)
-
-                logging.basicConfig(filename='./logs/main.log', format="%(asctime)s - %(message)s",
-                                level=logging.INFO)
-
-                logging.info(f"{datetime.now().isoformat()} - Getting {topic.upper()}")
-
-                cur_date = datetime.now().strftime("%b_%d").lower()
-
-                print(f"Performing collections for {topic.upper()} on {cur_date}\n{15*'-'}")
-
-                q = queries[topic]["q"]
-                foc_date = datetime.fromisoformat(queries[topic]["focal_date"])
-                start_date = foc_date - timedelta(days=onetailed_span)
-                start_date = start_date.isoformat()[:19] + "Z"
-                end_date = foc_date + timedelta(days=onetailed_span)
-                end_date = end_date.isoformat()[:19] + "Z"
-
-                collect_query = {
-                "part": "snippet",
-                "maxResults": 50,
-                "order": "date",
-                "safeSearch": "none",
-                "publishedAfter": start_date,
-                "publishedBefore": end_date,
-                "type": "video",
-                "q": q
-                }
-
-                video_file = f"{cur_date}_videos.ndjson"
-
-                ytapi.collect_videos(query=collect_query, dev_key=dev_key, path=path, output_file=video_file, metadata_file=f"{cur_date}_metadata.ndjson", increment_calls=1, suppress_quota_warning=False, logfile=f"./logs/{cur_date}.log")
-
-                vid_ids = set()
-                channel_ids = set()
-                with open(os.path.join(path, video_file), 'r') as f:
-                        for line in f:
-                                raw = json.loads(line)
-                                vid_ids.add(raw['id']['videoId'])
-                                channel_ids.add(raw['snippet']['channelId'])
-                
-                dets_query = {"part": "snippet,contentDetails,statistics", "id": vid_ids, "maxResults": 50}
-                ytapi.get_video_details(query=dets_query, dev_key=dev_key, path=path, output_file=f"{cur_date}_details.ndjson", logfile=f"./logs/{cur_date}.log")
+        def threads_stage():
+                thread_query = {"part": "snippet,replies", "videoId": thread_video_ids, "maxResults": 100, "order": "time"}
+                with journal(topic, cur_date, 'threads') as checkpoint:
+                        ytapi.collect_threads(query=thread_query, dev_key=keys, path=path, output_file=thread_file, logfile=logfile, workers=num_workers, checkpoint=checkpoint, on_item=on_thread)
 
-                chan_query = {"part": "snippet,contentDetails,statistics", "id": channel_ids, "maxResults": 50}
-                ytapi.get_channel_details(query=chan_query, dev_key=dev_key, path=path, output_file=f"{cur_date}_channels.ndjson", logfile=f"./logs/{cur_date}.log")
-
-                thread_query = {"part": "snippet,replies", "videoId": vid_ids, "maxResults": 100, "order": "time"}
-                thread_file = f"{cur_date}_threads.ndjson"
-                ytapi.collect_threads(query=thread_query, dev_key=dev_key, path=path, output_file=thread_file, logfile=f"./logs/{cur_date}.log")
-                
-                thread_ids = set()
-
-                with open(os.path.join(path, thread_file), 'r') as f:
-                        for line in f:
-                                raw = json.loads(line)
-                                if raw['snippet']['totalReplyCount'] > 5:
-                                        thread_ids.add(raw['id'])
-                
+        def comments_stage():
                 comment_query = {"part": "id,snippet", "parentId": thread_ids, "maxResults": 100}
-                ytapi.collect_comments(query=comment_query, dev_key=dev_key, output_file=f"{cur_date}_comments.ndjson", path=path, logfile=f"./logs/{cur_date}.log")
+                with journal(topic, cur_date, 'comments') as checkpoint:
+                        ytapi.collect_comments(query=comment_query, dev_key=keys, output_file=f"{cur_date}_comments{record_ext}", path=path, logfile=logfile, workers=num_workers, checkpoint=checkpoint)
+
+        pipeline = Pipeline()
+        pipeline.stage('search', search_stage, feeds=(detail_ids, channel_ids, thread_video_ids))
+        pipeline.stage('details', details_stage)
+        pipeline.stage('channels', channels_stage)
+        pipeline.stage('threads', threads_stage, feeds=(thread_ids,))
+        pipeline.stage('comments', comments_stage)
+        pipeline.join()
+
+
+def topic_worker(topic, cur_date, keys, limiter):
+        # entry point of a topic process in parallel runs: pace and charge calls through the shared limiter
+        setup_main_log()
+        quota.limiter = limiter
+        collect_topic(topic, cur_date, keys)
+
+
+# schedule params:
+#
+# max_iters: int, specifies how many times to run the collection
+# wait_time: int, specifies how many time_unit to wait before the next collection
+# time_unit: str, see scheduler.py for acceptable args
+@schedule(max_iters=5, wait_time=5, time_unit="days")
+def main():
+        # the snapshot date is fixed once per run, so every topic writes the same date even if the run crosses midnight
+        cur_date = datetime.now().strftime("%b_%d").lower()
+        setup_main_log()
+
+        if not parallel_topics:
+                quota.configure(requests_per_second=requests_per_second, daily_units=daily_quota * len(dev_keys))
+                dev_key = KeyPool(dev_keys, daily_units=daily_quota, state_file=key_state_file)
+                try:
+                        for topic in queries:
+                                collect_topic(topic, cur_date, dev_key)
+                finally:
+                        dev_key.flush()  # the pool writes its state file in batches
+                return
+
+        # one process per topic, all started together so the snapshots land within the same window;
+        # the key pool and rate limiter live in a manager process, so all topics draw on one quota budget
+        with QuotaManager() as manager:
+                keys = manager.KeyPool(dev_keys, daily_units=daily_quota, state_file=key_state_file)
+                limiter = manager.RateLimiter(requests_per_second=requests_per_second, daily_units=daily_quota * len(dev_keys))
+
+                processes = {topic: Process(target=topic_worker, args=(topic, cur_date, keys, limiter), name=topic) for topic in queries}
+                try:
+                        for process in processes.values():
+                                process.start()
+                        for process in processes.values():
+                                process.join()
+                finally:
+                        keys.flush()
+
+        failed = [topic for topic, process in processes.items() if process.exitcode != 0]
+        if failed:
+                main_log.info(f"{datetime.now().isoformat()} - Collection failed for {', '.join(failed)}")
+                raise RuntimeError(f"Collection failed for topics: {', '.join(failed)}; see their logs in ./logs")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+from collections import defaultdict
+
+
+class EtagCache:
+    # last snapshot's videos.list/channels.list responses, so unchanged batches can be answered with a 304
+    # ETags belong to whole list responses, so they are stored per batch of IDs; items are stored per resource ID
+    def __init__(self, cache_file: str):
+        self.cache_file = cache_file
+        self.lock = threading.Lock()
+
+        self.batches = {}  # batch key -> {'ids': [...], 'etag': ...}
+        self.items = {}  # resource ID -> item
+        if os.path.exists(cache_file):
+            with open(cache_file, 'r') as f:
+                cached = json.load(f)
+            self.batches = cached['batches']
+            self.items = cached['items']
+
+        # only what is fetched or reused in this run (plus what a resumed run skipped, see save) is written back,
+        # so the cache always mirrors the latest snapshot
+        self.new_batches = {}
+        self.new_items = {}
+
+    @staticmethod
+    def batch_key(ids):
+        return ','.join(sorted(ids))
+
+    def group(self, ids, window: int):
+        # batch IDs so that previous full batches that are still wanted are requested again unchanged, and their ETags
+        # can be reused; works on streams: IDs of an old batch are held back until the whole batch has arrived,
+        # all other IDs are packed into fresh batches as they come, and incomplete old batches are repacked at the end
+        member = {}
+        for key, batch in self.batches.items():
+            if len(batch['ids']) == window:
+                for idx in batch['ids']:
+                    member[idx] = key
+
+        held = defaultdict(list)
+        fresh = []
+        for idx in ids:
+            key = member.get(idx)
+            if key is None:
+                fresh.append(idx)
+                if len(fresh) == window:
+                    yield fresh
+                    fresh = []
+                continue
+
+            held[key].append(idx)
+            if len(held[key]) == window:
+                yield self.batches[key]['ids']
+                del held[key]
+
+        leftovers = fresh + [idx for batch in held.values() for idx in batch]
+        for start in range(0, len(leftovers), window):
+            yield leftovers[start:start + window]
+
+    def etag(self, ids):
+        batch = self.batches.get(self.batch_key(ids))
+        return batch['etag'] if batch else None
+
+    def reuse(self, ids):
+        # response was 304: serve the stored items (IDs missing last time stay missing)
+        key = self.batch_key(ids)
+        with self.lock:
+            self.new_batches[key] = self.batches[key]
+            items = [self.items[idx] for idx in ids if idx in self.items]
+            for item in items:
+                self.new_items[item['id']] = item
+        return items
+
+    def store(self, ids, response):
+        with self.lock:
+            self.new_batches[self.batch_key(ids)] = {'ids': list(ids), 'etag': response.get('etag')}
+            for item in response['items']:
+                self.new_items[item['id']] = item
+
+    def save(self, done=()):
+        # done: IDs a resumed stage skipped as already collected (its checkpoint's done units); their cached batches
+        # and items are kept, since this run never requested them again
+        with self.lock:
+            skipped = set(done).difference(idx for batch in self.new_batches.values() for idx in batch['ids'])
+            batches = {key: batch for key, batch in self.batches.items() if batch['ids'] and skipped.issuperset(batch['ids'])}
+            batches.update(self.new_batches)
+            items = {idx: item for idx, item in self.items.items() if idx in skipped}
+            items.update(self.new_items)
+
+        dirname = os.path.dirname(self.cache_file)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w+') as fw:
+            json.dump({'batches': batches, 'items': items}, fw)
+        os.replace(tmp_file, self.cache_file)
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from quota import DAILY_QUOTA, QuotaExhausted, quota_day
+
+
+def key_id(key: str):
+    # short fingerprint so raw API keys never end up in state files or logs
+    return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+
+class KeyPool:
+    # hands out API keys in order, moving on to the next key once one is out of quota
+    # units spent per key are persisted to state_file, so a restart on the same (Pacific) day skips spent keys;
+    # spends are tallied in memory and written every save_units units or save_interval seconds, on exhaust and on flush
+    def __init__(self, keys, daily_units: int=DAILY_QUOTA, state_file: str=None, save_units: int=100, save_interval: float=60):
+        if isinstance(keys, str):
+            keys = [keys]
+        if not keys:
+            raise ValueError("KeyPool needs at least one API key")
+
+        self.keys = list(dict.fromkeys(keys))
+        self.daily_units = daily_units
+        self.state_file = state_file
+        self.save_units = save_units
+        self.save_interval = save_interval
+        self.lock = threading.Lock()
+
+        self.unsaved = 0  # units spent since the state file was last written
+        self.last_save = time.monotonic()
+
+        self.day = quota_day()
+        self.used = {key: 0 for key in self.keys}
+        self.exhausted = set()
+
+        self._load()
+
+    @classmethod
+    def wrap(cls, dev_key):
+        # collectors accept either a plain key or a pool (including a proxy to a pool shared between processes)
+        if isinstance(dev_key, str):
+            return cls(dev_key)
+        return dev_key
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+
+        with open(self.state_file, 'r') as f:
+            state = json.load(f)
+
+        if state.get('day') != self.day:
+            return  # quota has been reset since the state was written
+
+        ids = {key_id(key): key for key in self.keys}
+        for kid, units in state.get('used', {}).items():
+            if kid in ids:
+                self.used[ids[kid]] = units
+        self.exhausted = {ids[kid] for kid in state.get('exhausted', []) if kid in ids}
+
+    def _save(self):
+        if not self.state_file:
+            return
+
+        state = {'day': self.day,
+                 'used': {key_id(key): units for key, units in self.used.items()},
+                 'exhausted': [key_id(key) for key in self.exhausted]}
+
+        tmp_file = self.state_file + '.tmp'
+        with open(tmp_file, 'w+') as fw:
+            json.dump(state, fw)
+        os.replace(tmp_file, self.state_file)
+
+        self.unsaved = 0
+        self.last_save = time.monotonic()
+
+    def _roll_day(self):
+        today = quota_day()
+        if today != self.day:
+            self.day = today
+            self.used = {key: 0 for key in self.keys}
+            self.exhausted = set()
+
+    def current(self, units: int=1):
+        # first key that has not been exhausted and can still afford a call of `units`
+        with self.lock:
+            self._roll_day()
+            for key in self.keys:
+                if key not in self.exhausted and self.used[key] + units <= self.daily_units:
+                    return key
+
+        raise QuotaExhausted(f"All {len(self.keys)} API keys are out of quota for {self.day}")
+
+    def spend(self, key: str, units: int):
+        with self.lock:
+            self._roll_day()
+            self.used[key] += units
+            self.unsaved += units
+            if self.unsaved >= self.save_units or time.monotonic() - self.last_save >= self.save_interval:
+                self._save()
+
+    def exhaust(self, key: str):
+        # the API reported quotaExceeded for this key, whatever our own tally says
+        with self.lock:
+            self._roll_day()
+            self.exhausted.add(key)
+            self._save()
+
+        logging.info(f"API key {key_id(key)} exhausted after {self.used[key]} units, rotating")
+
+    def flush(self):
+        # write spends not yet in the state file, e.g. when a run ends
+        with self.lock:
+            if self.unsaved:
+                self._save()
+
+    def remaining(self):
+        with self.lock:
+            self._roll_day()
+            return sum(max(0, self.daily_units - self.used[key]) for key in self.keys if key not in self.exhausted)
@@ -0,0 +1,62 @@
+import logging
+import queue
+import threading
+
+
+_closed = object()
+
+
+class IdStream:
+    # thread-safe, de-duplicating queue of IDs passed from one collection stage to the next
+    # the consuming stage iterates over it and finishes once the producing stage closes it
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.seen = set()
+        self.lock = threading.Lock()
+
+    def put(self, idx):
+        with self.lock:
+            if idx in self.seen:
+                return
+            self.seen.add(idx)
+        self.queue.put(idx)
+
+    def close(self):
+        self.queue.put(_closed)
+
+    def __iter__(self):
+        while True:
+            idx = self.queue.get()
+            if idx is _closed:
+                return
+            yield idx
+
+
+class Pipeline:
+    # runs each stage in its own thread; when a stage ends (or fails) the streams it feeds are closed,
+    # so downstream stages drain what they have and finish instead of waiting forever
+    def __init__(self):
+        self.threads = []
+        self.errors = []
+
+    def stage(self, name: str, func, feeds=()):
+        def run():
+            try:
+                func()
+            except BaseException as e:
+                logging.info(f"Stage {name} failed: {e!r}")
+                self.errors.append(e)
+            finally:
+                for stream in feeds:
+                    stream.close()
+
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+        if self.errors:
+            raise self.errors[0]
@@ -0,0 +1,100 @@
+import threading
+import time
+from datetime import datetime
+from pytz import timezone as tz
+
+
+# quota units charged per call, keyed by the discovery method ID of the request
+ENDPOINT_COSTS = {
+    'youtube.search.list': 100,
+    'youtube.videos.list': 1,
+    'youtube.channels.list': 1,
+    'youtube.commentThreads.list': 1,
+    'youtube.comments.list': 1,
+}
+
+DAILY_QUOTA = 10000  # default daily allocation of a YouTube Data API project
+
+
+class QuotaExhausted(Exception):
+    pass
+
+
+def quota_day():
+    # the API quota resets at midnight Pacific time
+    return datetime.now(tz=tz('US/Pacific')).date().isoformat()
+
+
+def request_cost(request):
+    return ENDPOINT_COSTS.get(getattr(request, 'methodId', None), 1)
+
+
+class RateLimiter:
+    # token bucket for the per-second request rate plus a running tally against the daily unit budget
+    # thread-safe, so all collector workers share a single instance
+    def __init__(self, requests_per_second: float=10, daily_units: int=DAILY_QUOTA, burst: int=None):
+        self.rate = requests_per_second
+        self.capacity = burst or max(1, int(requests_per_second))
+        self.daily_units = daily_units
+
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.day = quota_day()
+        self.units_used = 0
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def _roll_day(self):
+        today = quota_day()
+        if today != self.day:
+            self.day = today
+            self.units_used = 0
+
+    def acquire(self, units: int=1):
+        # reserve a request slot and its quota units, then sleep until the slot comes up; raises if the budget cannot
+        # cover `units`; units of an attempt that goes unanswered or is retried are handed back through refund()
+        with self.lock:
+            self._roll_day()
+            if self.daily_units is not None and self.units_used + units > self.daily_units:
+                raise QuotaExhausted(f"Daily budget of {self.daily_units} units reached ({self.units_used} used, next call costs {units})")
+            self.units_used += units
+
+            self._refill()
+
+            # tokens may go negative: each caller waits out its own share of the deficit
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if delay > 0:
+            time.sleep(delay)
+
+    def refund(self, units: int, day: str):
+        # give back units reserved by acquire() on `day`; after the quota reset they were never counted
+        with self.lock:
+            if day == self.day:
+                self.units_used = max(0, self.units_used - units)
+
+    def throttle(self, seconds: float=1):
+        # called on rateLimitExceeded: drain the bucket so every worker pauses before its next call
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+    def remaining(self):
+        if self.daily_units is None:
+            return None
+        return self.daily_units - self.units_used
+
+
+limiter = RateLimiter()
+
+
+def configure(requests_per_second: float=10, daily_units: int=DAILY_QUOTA, burst: int=None):
+    # replace the shared limiter used by every call through youtube_api_calls.get_response
+    global limiter
+    limiter = RateLimiter(requests_per_second=requests_per_second, daily_units=daily_units, burst=burst)
+    return limiter
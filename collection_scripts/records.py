@@ -0,0 +1,157 @@
+import gzip
+import io
+import json
+import os
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# outputs are compressed according to their extension: .ndjson, .ndjson.gz or .ndjson.zst
+COMPRESSED_EXTS = ('.gz', '.zst')
+
+buffer_size = 1 << 20  # bytes of encoded records held before they are handed to the (compressing) file
+
+
+def dumps(item):
+    # encoded record line without the newline; orjson is several times faster than json where it is installed
+    if orjson:
+        return orjson.dumps(item)
+    return json.dumps(item).encode('utf-8')
+
+
+def loads(line):
+    if orjson:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def compression(path: str):
+    if path.endswith('.gz'):
+        return 'gzip'
+    if path.endswith('.zst'):
+        return 'zstd'
+    return None
+
+
+def require_zstd(path: str):
+    if zstandard is None:
+        raise ImportError(f"Reading or writing {path} needs the zstandard package (pip install zstandard)")
+
+
+def drop_torn_line(path: str, block: int=1 << 16):
+    # cut a final line left without its newline by a crash mid-write; appending after it would glue the next record
+    # onto it (it was never checkpointed, so nothing is lost)
+    if not os.path.exists(path):
+        return
+
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b'\n':
+            return
+
+        while end > 0:
+            start = max(0, end - block)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            end = start
+        f.truncate(0)
+
+
+class RecordWriter:
+    # NDJSON writer with one large write per buffer_size bytes instead of one small write per record
+    # flush() makes everything written so far readable on disk (a sync point inside compressed streams), so it is
+    # safe to mark a checkpoint after it; appending to a compressed file starts a new gzip member / zstd frame
+    def __init__(self, path: str, mode: str='w+', buffer_size: int=buffer_size):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        self.compression = compression(path)
+
+        file_mode = 'ab' if mode.startswith('a') else 'wb'
+        if file_mode == 'ab' and self.compression is None:
+            drop_torn_line(path)
+        self.raw = open(path, file_mode)
+
+        if self.compression == 'gzip':
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode=file_mode)
+        elif self.compression == 'zstd':
+            require_zstd(path)
+            self.stream = zstandard.ZstdCompressor(level=3).stream_writer(self.raw, closefd=False)
+        else:
+            self.stream = self.raw
+
+    def write(self, item):
+        self.buffer += dumps(item)
+        self.buffer += b'\n'
+        if len(self.buffer) >= self.buffer_size:
+            self._drain()
+
+    def _drain(self):
+        if self.buffer:
+            self.stream.write(self.buffer)
+            self.buffer.clear()
+
+    def flush(self):
+        self._drain()
+        if self.compression == 'gzip':
+            self.stream.flush(zlib.Z_SYNC_FLUSH)
+        elif self.compression == 'zstd':
+            self.stream.flush(zstandard.FLUSH_BLOCK)
+        self.raw.flush()
+
+    def close(self):
+        self._drain()
+        if self.stream is not self.raw:
+            self.stream.close()
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_lines(path: str):
+    # binary line iterator over a plain, gzip or zstd NDJSON file
+    kind = compression(path)
+    if kind == 'gzip':
+        return gzip.open(path, 'rb')
+    if kind == 'zstd':
+        require_zstd(path)
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+        return io.BufferedReader(reader)
+    return open(path, 'rb')
+
+
+def read_records(path: str):
+    # parsed records of an NDJSON file; a torn final line or truncated compressed tail (a crash mid-write) ends the
+    # file quietly, since checkpoints only ever cover what was flushed before it; a malformed line before the last
+    # one is corruption and raises ValueError
+    with open_lines(path) as f:
+        try:
+            torn = None  # number of a line that failed to parse, fine only if no other line follows it
+            for number, line in enumerate(f, 1):
+                if torn is not None:
+                    raise ValueError(f"Malformed record on line {torn} of {path}")
+                try:
+                    yield loads(line)
+                except ValueError:
+                    torn = number
+        except (EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ()):
+            return
@@ -1,15 +1,23 @@
-import json
 import logging
 import os
 import warnings
 import math
-import googleapiclient.discovery
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from googleapiclient.errors import HttpError
-from tenacity import retry, wait_exponential, retry_if_exception_type, stop_after_delay, before_sleep_log
+from tenacity import retry, wait_exponential, retry_if_exception, stop_after_delay, before_sleep_log
 from tqdm import tqdm
 from pytz import timezone as tz
 from datetime import datetime, timedelta
 from typing import Literal
+import quota
+from keypool import KeyPool
+from api_client import get_client, pooled_http
+from checkpoint import Checkpoint
+from etag_cache import EtagCache
+from channel_cache import ChannelCache
+from records import RecordWriter, read_records
 
 logger = logging.getLogger(__name__)
 
@@ -38,13 +46,51 @@ def make_request(client, query, endpoint: Literal['search_list', 'video_list', '
     return req
 
 
-@retry(retry=retry_if_exception_type(googleapiclient.errors.HttpError), wait=wait_exponential(multiplier=1, min=2, max=8), stop=stop_after_delay(20), before_sleep=before_sleep_log(logger, logging.WARNING))
+# discovery method ID behind each make_request endpoint, used to look up quota costs
+ENDPOINT_METHODS = {
+    'search_list': 'youtube.search.list',
+    'video_list': 'youtube.videos.list',
+    'threads': 'youtube.commentThreads.list',
+    'comments': 'youtube.comments.list',
+    'channel': 'youtube.channels.list',
+}
+
+
+max_ids_per_call = 50  # most IDs a *.list?id= request accepts
+
+NOT_MODIFIED = object()  # returned by get_response when a conditional request comes back 304
+
+
+def error_reason(e: HttpError):
+    try:
+        return e.error_details[0]['reason']
+    except (IndexError, KeyError, TypeError):
+        return None
+
+
+def is_rate_limited(e):
+    # only short-term rate limits are worth retrying with the same key; quotaExceeded is handled by key rotation
+    return isinstance(e, HttpError) and error_reason(e) == 'rateLimitExceeded'
+
+
+@retry(retry=retry_if_exception(is_rate_limited), wait=wait_exponential(multiplier=1, min=2, max=8), stop=stop_after_delay(20), before_sleep=before_sleep_log(logger, logging.WARNING))
 def get_response(request):
+    # every call is paced and charged against the daily budget by the shared limiter (see quota.py); an attempt that
+    # raises (rateLimitExceeded retries, quotaExceeded replays, connection errors) gets its units back
+    units, day = quota.request_cost(request), quota.quota_day()
+    quota.limiter.acquire(units)
+
     try:
-        response = request.execute()
+        with pooled_http() as http:
+            response = request.execute(http=http)
     except (AttributeError, HttpError) as e:
         if isinstance(e, HttpError):
-            if e.status_code == 403 and e.error_details[0]['reason'] in ['quotaExceeded', 'rateLimitExceeded']:
+            if e.status_code == 304:
+                response = NOT_MODIFIED
+            elif e.status_code == 403 and error_reason(e) in ['quotaExceeded', 'rateLimitExceeded']:
+                if error_reason(e) == 'rateLimitExceeded':
+                    quota.limiter.throttle()
+                quota.limiter.refund(units, day)
                 raise
             else:
                 logging.info(f"Error: {e}")
@@ -52,21 +98,276 @@ def get_response(request):
         else:
             logging.info(f"Error: {e}")
             response = None
-        
+    except BaseException:
+        quota.limiter.refund(units, day)
+        raise
+
     return response
 
 
-def collect_videos(query, dev_key: str, output_file: str, metadata_file: str, logfile=None, increment_calls=None, path: str=None, suppress_quota_warning=True):
+def call_api(keys: KeyPool, query, endpoint, etag: str=None):
+    # execute a request with the pool's current key; on quotaExceeded the key is retired and the request replayed with the next one
+    # with an etag the request is conditional and may return NOT_MODIFIED
+    cost = quota.ENDPOINT_COSTS[ENDPOINT_METHODS[endpoint]]
+
+    while True:
+        key = keys.current(cost)
+        request = make_request(get_client(key), query, endpoint=endpoint)
+        if etag:
+            request.headers['If-None-Match'] = etag
+        try:
+            response = get_response(request)
+        except HttpError as e:
+            if error_reason(e) == 'quotaExceeded':
+                keys.exhaust(key)
+                continue
+            raise
+
+        keys.spend(key, cost)
+        return response
+
+
+def get_items(keys: KeyPool, query, endpoint, etag_cache: EtagCache=None):
+    # a single ID-batch lookup; with an ETag cache it is sent conditionally and a 304 reuses last snapshot's items
+    ids = query['id'].split(',')
+    etag = etag_cache.etag(ids) if etag_cache else None
+
+    response = call_api(keys, query, endpoint, etag=etag)
+    if response is NOT_MODIFIED:
+        return etag_cache.reuse(ids)
+    if response is None:
+        return None
+
+    if etag_cache:
+        etag_cache.store(ids, response)
+    return response['items']
+
+
+def paginate(keys: KeyPool, query, endpoint):
+    # yields every page of a listing, starting at query['pageToken'] if set
+    # works on its own copy of the query so concurrent walks never share a pageToken
+    query = query.copy()
+
+    while True:
+        response = call_api(keys, query, endpoint)
+        if response is None:
+            break
+
+        yield response
+
+        if 'nextPageToken' in response:
+            query['pageToken'] = response['nextPageToken']
+        else:
+            break
+
+
+def collect_pages(keys: KeyPool, query, endpoint, id_param, idx):
+    # fetch all pages for a single video/thread ID and return the ID with their items
+    query = query.copy()
+    query[id_param] = idx
+    query.pop('pageToken', None)
+
+    items = []
+    for response in paginate(keys, query, endpoint):
+        items.extend(response['items'])
+
+    return idx, items
+
+
+def unique(ids):
+    # de-duplicate lazily, so IDs streamed in from an earlier stage are handled as soon as they arrive
+    seen = set()
+    for idx in ids:
+        if idx not in seen:
+            seen.add(idx)
+            yield idx
+
+
+def batched(ids, size: int):
+    batch = []
+    for idx in ids:
+        batch.append(idx)
+        if len(batch) == size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def replay_items(output_file: str, on_item):
+    # a resumed stage skips finished work, so pass the items it already wrote to on_item before collecting more
+    if not os.path.exists(output_file):
+        return
+
+    for item in read_records(output_file):
+        on_item(item)
+
+
+def run_concurrently(func, args, workers=1, ordered=False):
+    # bounded thread pool: keeps at most `workers` calls in flight and yields results as they complete
+    # ordered=True yields results in input order instead (completed calls wait for slower ones ahead of them)
+    # with workers=1 results come back in input order either way, i.e. the old sequential behaviour
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        if ordered:
+            pending = deque()
+            for arg in args:
+                pending.append(executor.submit(func, arg))
+                if len(pending) >= workers:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+            return
+
+        pending = set()
+        for arg in args:
+            pending.add(executor.submit(func, arg))
+            if len(pending) < workers:
+                continue
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def parse_time(timestamp: str):
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+
+def format_time(timestamp: datetime):
+    return timestamp.isoformat()[:19] + "Z"
+
+
+def time_windows(published_after: str, published_before: str, increment_calls):
+    # split the publishedAfter/publishedBefore span into consecutive windows of increment_calls hours
+    start = parse_time(published_after)
+    end = parse_time(published_before)
+
+    windows = []
+    while start < end:
+        stop = start + timedelta(hours=increment_calls)
+        windows.append((format_time(start), format_time(stop)))
+        start = stop
+
+    return windows
+
+
+def window_unit(window):
+    # checkpoint key of a search window
+    return '/'.join(window)
+
+
+def collect_window(keys: KeyPool, query, window, page_token: str=None, stop=None):
+    # page through a single search window, optionally resuming at page_token; returns (metadata, items) for every page
+    # stop(pages) is checked after each page and ends the walk early when it returns True
+    query = query.copy()
+    query['publishedAfter'], query['publishedBefore'] = window
+    query.pop('pageToken', None)
+    if page_token:
+        query['pageToken'] = page_token
+
+    pages = []
+    for response in paginate(keys, query, endpoint='search_list'):
+        try:
+            items = response.pop('items')  # remove items from response dict so we can write it as metadata
+        except KeyError:
+            break
+
+        query_time = datetime.now(tz=tz('UTC'))
+        response['query_time'] = query_time.isoformat()[:19] + "Z"
+        response['query'] = query.copy()
+
+        pages.append((response, items))
+
+        if stop and stop(pages):
+            break
+
+        if 'nextPageToken' in response:
+            query['pageToken'] = response['nextPageToken']
+
+    return pages
+
+
+def is_saturated(pages, result_cap: int=500):
+    # a window is saturated once it returns result_cap items, the most search.list will page through for one query
+    if not pages:
+        return False
+    if sum(len(items) for _, items in pages) >= result_cap:
+        return True
+
+    # totalResults is a loose estimate (often huge for windows with no results), so it is only trusted
+    # when the first page also came back full with more pages to follow
+    first, items = pages[0]
+    page_info = first.get('pageInfo', {})
+    return (len(pages) == 1 and 'nextPageToken' in first and page_info.get('totalResults', 0) > result_cap
+            and len(items) >= first['query'].get('maxResults', 5))
+
+
+def adaptive_windows(keys: KeyPool, query, increment_calls, min_increment: float=1/12, max_increment: float=24, result_cap: int=500, checkpoint: Checkpoint=None):
+    # walk the publishedAfter/publishedBefore span with a variable window width, starting at increment_calls hours:
+    # a saturated window is bisected and collected again (down to min_increment hours), and after a sparse window
+    # the next one is twice as wide (up to max_increment hours), merging quiet stretches into a single call
+    # yields (window, pages) in time order; each page's metadata records the window it was collected for
+    start = parse_time(query['publishedAfter'])
+    end = parse_time(query['publishedBefore'])
+    width = increment_calls
+    page_token = None
+
+    if checkpoint:
+        # resume after the last finished window, or inside a partly written one
+        finished = [parse_time(unit.split('/')[1]) for unit in checkpoint.done]
+        if finished:
+            start = max(start, max(finished))
+
+        for unit, token in checkpoint.pages.items():
+            after, before = unit.split('/')
+            if parse_time(after) == start:
+                width = (parse_time(before) - start).total_seconds() / 3600
+                page_token = token
+
+    while start < end:
+        stop = min(start + timedelta(hours=width), end)
+        window = (format_time(start), format_time(stop))
+
+        splittable = width / 2 >= min_increment and not page_token
+        stop_early = functools.partial(is_saturated, result_cap=result_cap) if splittable else None
+
+        pages = collect_window(keys, query, window, page_token, stop=stop_early)
+        saturated = is_saturated(pages, result_cap)
+
+        if saturated and splittable:
+            width /= 2
+            continue
+
+        for response, _ in pages:
+            response['window'] = {'publishedAfter': window[0], 'publishedBefore': window[1],
+                                  'hours': (stop - start).total_seconds() / 3600, 'saturated': saturated}
+
+        yield window, pages
+
+        n_items = sum(len(items) for _, items in pages)
+        if not saturated and n_items < query.get('maxResults', 5):
+            width = min(width * 2, max_increment)
+
+        start = stop
+        page_token = None
+
+
+def collect_videos(query, dev_key: str | KeyPool, output_file: str, metadata_file: str, logfile=None, increment_calls=None, path: str=None, suppress_quota_warning=True, workers: int=1, checkpoint: Checkpoint=None, adaptive=False, min_increment: float=1/12, max_increment: float=24, result_cap: int=500, on_item=None):
+    # on_item is called with every search result written, e.g. to stream video IDs on to the later stages
 
     if path:
         output_file = os.path.join(path, output_file)
         metadata_file = os.path.join(path, metadata_file)
 
-    api_service_name = "youtube"
-    api_version = "v3"
-
-    youtube = googleapiclient.discovery.build(api_service_name, api_version, developerKey=dev_key)
-    
+    keys = KeyPool.wrap(dev_key)
     query = query.copy()
 
     try:
@@ -86,336 +387,238 @@ def collect_videos(query, dev_key: str, output_file: str, metadata_file: str, lo
     if logfile:
         logging.basicConfig(filename=logfile, format="%(asctime)s - %(message)s", level=logging.INFO)
 
-    with open(output_file, 'w+') as fw, open(metadata_file, 'w+') as md:
-        
-        if increment_calls:
-            end_date = query['publishedBefore']
-            published_after = query['publishedAfter']
-            published_before = datetime.fromisoformat(published_after.replace("Z", "+00:00"))
-            published_before += timedelta(hours=increment_calls)
-            published_before = published_before.isoformat()[:19] + "Z"
-            query['publishedBefore'] = published_before
-            
-            timespan = datetime.fromisoformat(end_date) - datetime.fromisoformat(query['publishedAfter'])
-            timespan = timespan.total_seconds()/3600  # convert to hours
-            total_calls = math.ceil(timespan/increment_calls)  # round any decimals up to integers
-
-            if not suppress_quota_warning:
-                warnings.warn(f"This video collection operation will cost a minimum of {total_calls * 100} quota units. Please ensure you have enough to avoid rate limits, or limit your number of queries.")
-
-            with tqdm(total=total_calls, desc="Collecting videos...") as pbar:
-                while datetime.fromisoformat(published_after.replace("Z", "+00:00")) < datetime.fromisoformat(end_date.replace("Z", "+00:00")):
-                    
-                    request = make_request(youtube, query, endpoint='search_list')
-                    # request = youtube.search().list(**query)
-
-                    while True:
-                        # response = request.execute()
-                        response = get_response(request)
-                        try:
-                            items = response.pop('items')  # remove items from response dict so we can write it as metadata
-                        except (KeyError, TypeError):
-                            break
-
-                        query_time = datetime.now(tz=tz('UTC'))
-                        response['query_time'] = query_time.isoformat()[:19] + "Z"
-                        response['query'] = query
-
-                        md.write(json.dumps(response) + '\n')
-
-                        # loop to write data
-                        for item in items:
-                            fw.write(json.dumps(item) + '\n')
-
-                        if 'nextPageToken' in response:
-                            query['pageToken'] = response['nextPageToken']
-                            request = make_request(youtube, query, endpoint='search_list')
-                            # request = youtube.search().list(**query)
-
-                            # pg_count += 1
-                            # if pg_count % 10 == 0:
-                            #     print(f"Parsed {pg_count} pages")
-                        else:
-                            published_after = datetime.fromisoformat(published_after.replace("Z", "+00:00"))
-                            published_after += timedelta(hours=increment_calls)
-                            published_after = published_after.isoformat()[:19] + "Z"
-                            query['publishedAfter'] = published_after
-                            published_before = datetime.fromisoformat(published_before.replace("Z", "+00:00"))
-                            published_before += timedelta(hours=increment_calls)
-                            published_before = published_before.isoformat()[:19] + "Z"
-                            query['publishedBefore'] = published_before
-
-                            pbar.update(1)
-
-                            break
-
-        else:
-            request = make_request(youtube, query, endpoint='search_list')
-            # request = youtube.search().list(**query)
-
-            while True:
-                # response = request.execute()
-                response = get_response(request)
-                try:
-                    items = response.pop('items')
-                except (KeyError, TypeError):
-                    break
-                
-                query_time = datetime.now(tz=tz('UTC'))
-                response['query_time'] = query_time.isoformat()[:19] + "Z"
-                response['query'] = query
-
-                md.write(json.dumps(response) + '\n')
-
-                # loop to write data
-                for item in items:
-                    fw.write(json.dumps(item) + '\n')
-
-                if 'nextPageToken' in response:
-                    query['pageToken'] = response['nextPageToken']
-                    request = make_request(youtube, query, endpoint='search_list')
-                    # request = youtube.search().list(**query)
-                
-                else:
-                    break
+    if increment_calls and adaptive:
+        # window widths are chosen as results come in, so windows are collected one after another
+        windows = time_windows(query['publishedAfter'], query['publishedBefore'], increment_calls)
 
+    elif increment_calls:
+        windows = time_windows(query['publishedAfter'], query['publishedBefore'], increment_calls)
 
-def get_video_details(query, dev_key: str, output_file: str, logfile=None, path: str=None, ids=None):
-    if path:
-        output_file = os.path.join(path, output_file)
+        min_cost = len(windows) * quota.ENDPOINT_COSTS['youtube.search.list']
+        remaining = [units for units in (quota.limiter.remaining(), keys.remaining()) if units is not None]
+        remaining = min(remaining) if remaining else None
 
-    api_service_name = "youtube"
-    api_version = "v3"
+        if not suppress_quota_warning:
+            warnings.warn(f"This video collection operation will cost a minimum of {min_cost} quota units. Please ensure you have enough to avoid rate limits, or limit your number of queries.")
 
-    youtube = googleapiclient.discovery.build(api_service_name, api_version, developerKey=dev_key)
-
-    if logfile:
-        logging.basicConfig(filename=logfile, format="%(asctime)s - %(message)s", level=logging.INFO)
+        if remaining is not None and min_cost > remaining:
+            warnings.warn(f"Minimum cost of {min_cost} units exceeds the {remaining} units left in today's budget; collection will stop once the budget is spent.", stacklevel=2)
 
-    if ids:
-        video_ids = list(set(ids))
-        query = query.copy()
-        query['id'] = video_ids
     else:
-        video_ids = list(set(query['id']))
-
-    with open(output_file, 'w+') as fw:
-        if len(query['id']) > query['maxResults']:
-            try:
-                window = query['maxResults']
-            except KeyError:
-                window = 5  # API default
-
-            start_index = 0
-            end_index = window
-
-            print(f"Estimated quota cost: {math.ceil(len(video_ids)/window)}")
+        windows = [(query['publishedAfter'], query['publishedBefore'])]
 
-            with tqdm(total=len(video_ids), desc="Collecting video details") as pbar:
-                while end_index < len(video_ids):
-                    rolling_ids = video_ids[start_index:end_index]
-                    temp_idq = ','.join(rolling_ids)
+    mode = 'w+'
+    if checkpoint:
+        mode = checkpoint.mode
 
-                    temp_query = query.copy()
-                    temp_query['id'] = temp_idq
+    if on_item and mode == 'a':
+        replay_items(output_file, on_item)
 
-                    request = make_request(youtube, temp_query, endpoint='video_list')
-                    response = get_response(request)
-                    # response = request.execute()
+    if increment_calls and adaptive:
+        results = adaptive_windows(keys, query, increment_calls, min_increment, max_increment, result_cap, checkpoint)
 
-                    start_index += window
-                    end_index += window
-
-                    pbar.update(window)
+    else:
+        if checkpoint:
+            windows = [window for window in windows if not checkpoint.is_done(window_unit(window))]
+
+        def fetch(window):
+            page_token = checkpoint.page_token(window_unit(window)) if checkpoint else None
+            return collect_window(keys, query, window, page_token)
+
+        # windows run concurrently but are written back in window order, so output files are reproducible
+        results = zip(windows, run_concurrently(fetch, windows, workers, ordered=True))
+
+    with RecordWriter(output_file, mode) as fw, RecordWriter(metadata_file, mode) as md:
+        with tqdm(total=len(windows), desc="Collecting videos...", disable=not increment_calls) as pbar:
+            for window, pages in results:
+                for response, items in pages:
+                    md.write(response)
+
+                    # loop to write data
+                    for item in items:
+                        fw.write(item)
+                        if on_item:
+                            on_item(item)
+
+                    if checkpoint and 'nextPageToken' in response:
+                        fw.flush()
+                        md.flush()
+                        checkpoint.mark_page(window_unit(window), response['nextPageToken'])
+
+                if checkpoint:
+                    fw.flush()
+                    md.flush()
+                    checkpoint.mark_done(window_unit(window))
+
+                if increment_calls:
+                    pbar.update((parse_time(window[1]) - parse_time(window[0])).total_seconds() / 3600 / increment_calls)
+
+
+def lookup_ids(query, dev_key: str | KeyPool, output_file: str, endpoint, ids=None, workers: int=1, checkpoint: Checkpoint=None, etag_cache: EtagCache=None, item_cache: ChannelCache=None, desc: str=None):
+    # batched lookup engine for any *.list endpoint taking an id parameter (videos.list, channels.list, ...)
+    # packs IDs into full requests of maxResults IDs (50 at most), keeps up to `workers` batches in flight under
+    # the shared rate limit, and returns the IDs that were requested but did not come back
+    # ids (or query['id']) may be any iterable, including an IdStream fed by a running search stage
+    # with an item_cache, IDs it holds a fresh item for are written straight from it and never requested
+    keys = KeyPool.wrap(dev_key)
+
+    lookup = ids if ids else query['id']
+    total = len(set(lookup)) if isinstance(lookup, (list, set, tuple)) else None
+    lookup = unique(lookup)
+
+    window = min(query.get('maxResults', max_ids_per_call), max_ids_per_call)
+
+    if total is not None:
+        print(f"Estimated quota cost: {math.ceil(total/window)}")
+
+    mode = 'w+'
+    if checkpoint:
+        mode = checkpoint.mode
+        lookup = (idx for idx in lookup if not checkpoint.is_done(idx))
+
+    def fetch(batch):
+        temp_query = query.copy()
+        temp_query['id'] = ','.join(batch)
+        return batch, get_items(keys, temp_query, endpoint=endpoint, etag_cache=etag_cache)
+
+    missing = []
+
+    with RecordWriter(output_file, mode) as fw:
+        with tqdm(total=total, desc=desc) as pbar:
+            if item_cache:
+                def uncached(ids):
+                    # runs on this thread as batches are submitted, so writing to fw here does not race the loop below
+                    for idx in ids:
+                        item = item_cache.get(idx, query['part'])
+                        if item is None:
+                            yield idx
+                            continue
+
+                        fw.write(item)
+                        pbar.update(1)
+                        if checkpoint:
+                            fw.flush()
+                            checkpoint.mark_done(idx)
+
+                lookup = uncached(lookup)
+
+            batches = etag_cache.group(lookup, window) if etag_cache else batched(lookup, window)
+
+            for batch, items in run_concurrently(fetch, batches, workers):
+                pbar.update(len(batch))
+
+                if items is None:
+                    missing.extend(batch)
+                    continue
 
-                    if response is None:
-                        continue
+                for item in items:
+                    fw.write(item)
 
-                    for item in response['items']:
-                        fw.write(json.dumps(item) + '\n')
+                if item_cache:
+                    item_cache.store(items, query['part'])
 
-                if pbar.n < len(video_ids):
-                    pbar.update(len(video_ids)-pbar.n)
+                returned = {item['id'] for item in items}
+                missing.extend(idx for idx in batch if idx not in returned)
 
-        else:
-            temp_idq = ','.join(video_ids)
-            temp_query = query
-            temp_query['id'] = temp_idq
+                if checkpoint:
+                    fw.flush()
+                    checkpoint.mark_done(*batch)
 
-            request = make_request(youtube, temp_query, endpoint='video_list')
-            response = get_response(request)
-            # response = request.execute()
+    if item_cache:
+        logging.info(f"{item_cache.hits} {ENDPOINT_METHODS[endpoint]} items served from cache")
+    if missing:
+        logging.info(f"{len(missing)} IDs not returned by {ENDPOINT_METHODS[endpoint]}")
 
-            if response is not None:
-                for item in response['items']:
-                    fw.write(json.dumps(item) + '\n')
+    return missing
 
 
-def get_channel_details(query, dev_key: str, output_file: str, logfile=None, path: str=None, ids=None):
+def get_video_details(query, dev_key: str | KeyPool, output_file: str, logfile=None, path: str=None, ids=None, workers: int=1, checkpoint: Checkpoint=None, etag_cache: EtagCache=None):
+    # returns the video IDs that were not found (deleted, private, ...)
     if path:
         output_file = os.path.join(path, output_file)
 
-    api_service_name = "youtube"
-    api_version = "v3"
-
-    youtube = googleapiclient.discovery.build(api_service_name, api_version, developerKey=dev_key)
-
     if logfile:
         logging.basicConfig(filename=logfile, format="%(asctime)s - %(message)s", level=logging.INFO)
 
-    if ids:
-        channel_ids = list(set(ids))
-    else:
-        channel_ids = list(set(query['id']))
+    return lookup_ids(query, dev_key, output_file, endpoint='video_list', ids=ids, workers=workers, checkpoint=checkpoint, etag_cache=etag_cache, desc="Collecting video details")
 
-    with open(output_file, 'w+') as fw:
-        if len(query['id']) > query['maxResults']:
-            try:
-                window = query['maxResults']
-            except KeyError:
-                window = 5  # API default
 
-            start_index = 0
-            end_index = window
+def get_channel_details(query, dev_key: str | KeyPool, output_file: str, logfile=None, path: str=None, ids=None, workers: int=1, checkpoint: Checkpoint=None, etag_cache: EtagCache=None, channel_cache: ChannelCache=None):
+    # returns the channel IDs that were not found (terminated, ...)
+    if path:
+        output_file = os.path.join(path, output_file)
 
-            print(f"Estimated quota cost: {math.ceil(len(channel_ids)/window)}")
+    if logfile:
+        logging.basicConfig(filename=logfile, format="%(asctime)s - %(message)s", level=logging.INFO)
 
-            with tqdm(total=len(channel_ids), desc="Collecting channel details") as pbar:
-                while end_index < len(channel_ids):
-                    rolling_ids = channel_ids[start_index:end_index]
-                    temp_idq = ','.join(rolling_ids)
+    return lookup_ids(query, dev_key, output_file, endpoint='channel', ids=ids, workers=workers, checkpoint=checkpoint, etag_cache=etag_cache, item_cache=channel_cache, desc="Collecting channel details")
 
-                    temp_query = query.copy()
-                    temp_query['id'] = temp_idq
 
-                    request = make_request(youtube, temp_query, endpoint='channel')
-                    response = get_response(request)
-                    # response = request.execute()
+def collect_threads(query, dev_key: str | KeyPool, output_file: str, path: str=None, logfile=None, ids=None, workers: int=1, checkpoint: Checkpoint=None, on_item=None):
+    # ids (or query['videoId']) may be any iterable, including an IdStream fed by a running search stage
+    # on_item is called with every thread written, e.g. to stream thread IDs on to collect_comments
+    if path:
+        output_file = os.path.join(path, output_file)
 
-                    start_index += window
-                    end_index += window
+    video_ids = ids if ids else query['videoId']
+    total = len(set(video_ids)) if isinstance(video_ids, (list, set, tuple)) else None
+    video_ids = unique(video_ids)
 
-                    pbar.update(window)
+    if logfile:
+        logging.basicConfig(filename=logfile, format="%(asctime)s - %(message)s", level=logging.INFO)
 
-                    if response is None:
-                        continue
+    fetch = functools.partial(collect_pages, KeyPool.wrap(dev_key), query, 'threads', 'videoId')
 
-                    for item in response['items']:
-                        fw.write(json.dumps(item) + '\n')
+    mode = 'w+'
+    if checkpoint:
+        mode = checkpoint.mode
+        video_ids = (idx for idx in video_ids if not checkpoint.is_done(idx))
 
-                if pbar.n < len(channel_ids):
-                    pbar.update(len(channel_ids)-pbar.n)
+    if on_item and mode == 'a':
+        replay_items(output_file, on_item)
 
-        else:
-            temp_idq = ','.join(channel_ids)
-            temp_query = query
-            temp_query['id'] = temp_idq
+    with RecordWriter(output_file, mode) as fw:
+        with tqdm(total=total) as pbar:
+            for idx, items in run_concurrently(fetch, video_ids, workers):
+                for item in items:
+                    fw.write(item)
+                    if on_item:
+                        on_item(item)
 
-            request = make_request(youtube, temp_query, endpoint='channel')
-            response = get_response(request)
-            # response = request.execute()
+                if checkpoint:
+                    fw.flush()
+                    checkpoint.mark_done(idx)
 
-            if response is not None:
-                for item in response['items']:
-                    fw.write(json.dumps(item) + '\n')
+                pbar.update(1)
 
 
-def collect_threads(query, dev_key, output_file: str, path: str=None, logfile=None, ids=None):
+def collect_comments(query, dev_key: str | KeyPool, output_file: str, path: str=None, logfile=None, ids=None, workers: int=1, checkpoint: Checkpoint=None):
+    # ids (or query['parentId']) may be any iterable, including an IdStream fed by a running threads stage
     if path:
         output_file = os.path.join(path, output_file)
 
-    api_service_name = "youtube"
-    api_version = "v3"
-
-    youtube = googleapiclient.discovery.build(api_service_name, api_version, developerKey=dev_key)
-
-    if ids:
-        video_ids = list(set(ids))
-    else:
-        video_ids = list(set(query['videoId']))
+    thread_ids = ids if ids else query['parentId']
+    total = len(set(thread_ids)) if isinstance(thread_ids, (list, set, tuple)) else None
+    thread_ids = unique(thread_ids)
 
     if logfile:
         logging.basicConfig(filename=logfile, format="%(asctime)s - %(message)s", level=logging.INFO)
-    
-    query = query.copy()
 
-    with open(output_file, 'w+') as fw:
-        for idx in tqdm(video_ids):
-            query['videoId'] = idx
-
-            while True:
-                request = make_request(youtube, query, endpoint='threads')
-                response = get_response(request)
-                # response = request.execute()
-                if response is None:
-                    break
-                # request = make_request(youtube, query, endpoint='threads')
-                # try:
-                #     response = request.execute()
-                # except AttributeError:
-                #     print(f"{idx} not found, moving on...")
-                #     break
-
-                for item in response['items']:
-                    fw.write(json.dumps(item) + '\n')
-                    
-                if 'nextPageToken' in response:
-                    query['pageToken'] = response['nextPageToken']
-
-                else:
-                    try:
-                        del query['pageToken']
-                    except KeyError:
-                        pass
-                    break
-
-
-def collect_comments(query, dev_key, output_file: str, path: str=None, logfile=None, ids=None):
-    if path:
-        output_file = os.path.join(path, output_file)
-
-    api_service_name = "youtube"
-    api_version = "v3"
+    fetch = functools.partial(collect_pages, KeyPool.wrap(dev_key), query, 'comments', 'parentId')
 
-    youtube = googleapiclient.discovery.build(api_service_name, api_version, developerKey=dev_key)
+    mode = 'w+'
+    if checkpoint:
+        mode = checkpoint.mode
+        thread_ids = (idx for idx in thread_ids if not checkpoint.is_done(idx))
 
-    if ids:
-        thread_ids = list(set(ids))
-    else:
-        thread_ids = list(set(query['parentId']))
+    with RecordWriter(output_file, mode) as fw:
+        with tqdm(total=total) as pbar:
+            for idx, items in run_concurrently(fetch, thread_ids, workers):
+                for item in items:
+                    fw.write(item)
 
-    if logfile:
-        logging.basicConfig(filename=logfile, format="%(asctime)s - %(message)s", level=logging.INFO)
-    
-    query = query.copy()
+                if checkpoint:
+                    fw.flush()
+                    checkpoint.mark_done(idx)
 
-    with open(output_file, 'w+') as fw:
-        for idx in tqdm(thread_ids):
-            query['parentId'] = idx
-            pgcount = 0
-
-            while True:
-                request = make_request(youtube, query, endpoint='comments')
-                response = get_response(request)
-                # response = request.execute()
-                if response is None:
-                    break
-                # request = make_request(youtube, query, endpoint='threads')
-                # try:
-                #     response = request.execute()
-                # except AttributeError:
-                #     print(f"{idx} not found, moving on...")
-                #     break
-
-                for item in response['items']:
-                    fw.write(json.dumps(item) + '\n')
-                    
-                if 'nextPageToken' in response:
-                    query['pageToken'] = response['nextPageToken']
-
-                else:
-                    try:
-                        del query['pageToken']
-                    except KeyError:
-                        pass
-                    break
+                pbar.update(1)